@@ -0,0 +1,151 @@
+"""
+Module defines the alignment programs available to gradual_alignment.py.
+
+Each program is described by an Aligner, which knows how to build its command lines, what format it writes and how
+its threading is set. Aligners are registered by name in ALIGNERS; to make another program available, create an
+instance (or subclass of Aligner for programs with different command lines) and pass it to register().
+
+Currently assume the programs are installed to path, but change the paths (first argument) below as desired.
+"""
+__author__ = 'julianzaugg'
+
+import os
+
+from sequence import *
+
+
+class Aligner(object):
+    """ An alignment program that reads FASTA sequences on standard input and writes the alignment to standard
+    output. Subclasses override commands (and add_commands) for programs that work differently.
+    """
+
+    def __init__(self, name, args, output_format="clustal", thread_option=None, default_threads=None):
+        """
+        :param name: Name of the method, also used for output folders and files
+        :param args: Path of the program followed by additional parameters
+        :param output_format: Format written by the program, "clustal" or "fasta" (converted to CLUSTAL)
+        :param thread_option: Format string of the option setting the number of threads, e.g., "--thread=%i",
+        None if the program is single threaded
+        :param default_threads: Number of threads to use unless cores are balanced between jobs, None to leave
+        the program's default
+        """
+        self.name = name
+        self.args = list(args)
+        self.output_format = output_format
+        self.thread_option = thread_option
+        self.default_threads = default_threads
+        self.can_add = False
+
+    def __str__(self):
+        return "%s: %s" % (self.name, " ".join(self.args))
+
+    def path(self):
+        return self.args[0]
+
+    def thread_args(self, threads=None):
+        """ Return the arguments setting the number of threads, if the program is threaded """
+        threads = threads or self.default_threads
+        if self.thread_option and threads:
+            return [self.thread_option % threads]
+        return []
+
+    def cache_args(self):
+        """ Return the arguments that determine the result of an alignment (threading does not) """
+        return self.args
+
+    def commands(self, seqs, out_file, job_dir, threads=None):
+        """
+        Build the command(s) for aligning seqs
+        :param seqs: Sequences to align
+        :param out_file: Absolute path of the output, in output_format
+        :param job_dir: Temporary directory private to the job, for any input files
+        :param threads: Number of threads the job may use, None for default_threads
+        :return: List of (command arguments, standard input, standard output file) tuples, to be run in order
+        """
+        return [(self.args + self.thread_args(threads), fasta_string(seqs), out_file)]
+
+    def add_commands(self, aln_seqs, new_seqs, out_file, job_dir, threads=None, fragments=False):
+        """
+        Build the command(s) for adding new_seqs to the existing alignment of aln_seqs. Only available if can_add.
+        :param aln_seqs: Aligned sequences of the existing alignment
+        :param new_seqs: Sequences to add
+        :param fragments: Add new sequences as fragments, where the program distinguishes them
+        :return: List of (command arguments, standard input, standard output file) tuples, to be run in order
+        """
+        raise RuntimeError("Alignment method %s can not add to an existing alignment" % self.name)
+
+
+class MafftAligner(Aligner):
+    """ MAFFT, and its method specific scripts (linsi, fftns, ...). Adds sequences with --add/--addfragments. """
+
+    def __init__(self, name, args, default_threads=None):
+        Aligner.__init__(self, name, args, "clustal", "--thread=%i", default_threads)
+        self.can_add = True
+
+    def commands(self, seqs, out_file, job_dir, threads=None):
+        return [(self.args + self.thread_args(threads) + ["-"], fasta_string(seqs), out_file)]
+
+    def add_commands(self, aln_seqs, new_seqs, out_file, job_dir, threads=None, fragments=False):
+        aln_file = os.path.join(job_dir, "aln.fa")
+        new_file = os.path.join(job_dir, "new.fa")
+        write_fasta_file(aln_file, aln_seqs)
+        write_fasta_file(new_file, new_seqs)
+        add_flag = "--addfragments" if fragments else "--add"
+        return [(self.args + self.thread_args(threads) + [add_flag, new_file, aln_file], None, out_file)]
+
+
+class MuscleAligner(Aligner):
+    """ MUSCLE (v3). Adds sequences by aligning them, then aligning the two profiles. """
+
+    def __init__(self, name, args):
+        Aligner.__init__(self, name, args, "clustal")
+        self.can_add = True
+
+    def add_commands(self, aln_seqs, new_seqs, out_file, job_dir, threads=None, fragments=False):
+        aln_file = os.path.join(job_dir, "aln.fa")
+        new_aln_file = os.path.join(job_dir, "new.afa")
+        write_fasta_file(aln_file, aln_seqs)
+        # Profile-profile alignment, so more than one new sequence must be aligned first
+        return [([self.path(), "-quiet"], fasta_string(new_seqs), new_aln_file),
+                (self.args + ["-profile", "-in1", aln_file, "-in2", new_aln_file], None, out_file)]
+
+
+class TCoffeeAligner(Aligner):
+    """ T-Coffee, which reads its input from a file and names its own output file. """
+
+    def __init__(self, name, args, default_threads=None):
+        Aligner.__init__(self, name, args, "clustal", "-n_core=%i", default_threads)
+
+    def commands(self, seqs, out_file, job_dir, threads=None):
+        in_file = os.path.join(job_dir, "seqs.fa")
+        write_fasta_file(in_file, seqs)
+        return [(self.args + self.thread_args(threads) + ["-infile=%s" % in_file, "-output=aln",
+                                                          "-outfile=%s" % out_file], None, None)]
+
+
+ALIGNERS = {}
+
+def register(aligner):
+    """ Make aligner available by its name, replacing any aligner of the same name """
+    ALIGNERS[aligner.name] = aligner
+
+def get_aligner(name):
+    try:
+        return ALIGNERS[name]
+    except KeyError:
+        raise KeyError("Unknown alignment method %s, available methods are %s" % (name, ", ".join(sorted(ALIGNERS))))
+
+def fasta_string(seqs):
+    """ Return the specified sequences in FASTA format as a string """
+    return "".join(seq.write_fasta() for seq in seqs)
+
+
+register(MafftAligner("linsi", ["linsi", "--quiet", "--clustalout"]))
+register(MafftAligner("fftns", ["fftns", "--quiet", "--clustalout"])) # FFT-NS-2
+register(MuscleAligner("muscle", ["muscle", "-maxiters", "50", "-clw", "-clwstrict", "-quiet"]))
+register(TCoffeeAligner("t_coffee", ["t_coffee", "-quiet"], default_threads=4))
+register(Aligner("clustalo", ["clustalo", "-i", "-", "--outfmt=clu"], "clustal", "--threads=%i"))
+register(Aligner("kalign", ["kalign"], "fasta"))
+
+# The methods run by "-alnm all"
+DEFAULT_METHODS = ["linsi", "muscle", "t_coffee"]
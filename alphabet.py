@@ -1,3 +1,4 @@
+import numpy as np
 
 class Alphabet(object):
     """ Defines an immutable biological alphabet (e.g. the alphabet for DNA is AGCT) 
@@ -6,9 +7,11 @@ class Alphabet(object):
     of symbols of an alphabet (see class TupleStore below).
     """
     
-    def __init__(self, symbolString):
+    def __init__(self, symbolString, gaps = '-', wildcards = '*'):
         """ Construct an alphabet from a string of symbols. Lower case characters 
         will be converted to upper case, repeated characters are ignored.
+        gaps: characters encoded as gaps (see encode), unless symbols of the alphabet
+        wildcards: characters encoded as wildcards, unless symbols of the alphabet
         Example of constructing the DNA alphabet:
         >>> alpha = Alphabet('ACGTttga')
         >>> alpha.symbols
@@ -23,6 +26,31 @@ class Alphabet(object):
         self.symbols = tuple(_symbols); # create the immutable tuple from the extracted list
         self.length = len(self.symbols)
         self.annotations = {}
+        self._build_codes(gaps, wildcards)
+
+    def _build_codes(self, gaps, wildcards):
+        """ Build the tables for encoding characters as integer codes: symbols are coded by their index,
+        followed by one code each for gaps, wildcards and any other (unknown) character. Encoding is case
+        sensitive, as the alphabet's symbols are upper case. """
+        self.ndx = dict((sym, i) for i, sym in enumerate(self.symbols))
+        self.gap_code = len(self.symbols)
+        self.wildcard_code = self.gap_code + 1
+        self.unknown_code = self.gap_code + 2
+        self.ncodes = self.gap_code + 3 # number of codes, e.g., for counting codes with numpy.bincount
+        self.gaps = ''.join(c for c in gaps if c not in self.ndx)
+        self.wildcards = ''.join(c for c in wildcards if c not in self.ndx and c not in self.gaps)
+        self.lookup = np.empty(256, dtype=np.uint8) # character (byte) to code
+        self.lookup.fill(self.unknown_code)
+        for c in self.wildcards:
+            self.lookup[ord(c)] = self.wildcard_code
+        for c in self.gaps:
+            self.lookup[ord(c)] = self.gap_code
+        for sym, i in self.ndx.items():
+            self.lookup[ord(sym)] = i
+        # code to character, gaps and wildcards decode to the first configured character
+        self.ascii_codes = np.frombuffer(''.join(self.symbols), dtype=np.uint8)
+        self.decode_table = np.frombuffer(''.join(self.symbols) + (self.gaps or '-')[0] + (self.wildcards or '*')[0] +
+                                          '?', dtype=np.uint8)
 
     def __str__(self):
         return str(self.symbols)
@@ -43,12 +71,24 @@ class Alphabet(object):
     
     def index(self, sym):
         """ Retrieve the index of the given symbol in the alphabet. """
-        # If the symbol is valid, use the tuple's index function
-        if sym in self.symbols:
-            syms = self.symbols
-            return syms.index(sym)
-        else:
+        try:
+            return self.ndx[sym]
+        except (KeyError, TypeError):
             raise RuntimeError('Symbol %s is not indexed by alphabet %s' % (sym, str(self.symbols)))
+
+    def encode(self, string):
+        """ Encode a string (or a uint8 array of character codes, of any shape) as an array of integer codes:
+        the index of each symbol, gap_code, wildcard_code or unknown_code.
+        >>> DNA_Alphabet.encode('GAT-N')
+        array([2, 0, 3, 4, 6], dtype=uint8)
+        """
+        if isinstance(string, np.ndarray):
+            return self.lookup[string]
+        return self.lookup[np.frombuffer(string, dtype=np.uint8)]
+
+    def decode(self, codes):
+        """ Decode an array of codes (see encode) into a string; unknown characters decode as '?'. """
+        return self.decode_table[np.asarray(codes).ravel()].tostring()
         
     def __eq__(self, rhs):
         """ Test if the rhs alphabet is equal to ours. """
@@ -65,7 +105,7 @@ class Alphabet(object):
     def isSubsetOf(self, alpha2):
         """ Test if this alphabet is a subset of alpha2. """
         for sym in self.symbols:
-            if not alpha2.isValidSymbol(sym):
+            if not sym in alpha2:
                 return False
         return True
     
@@ -147,14 +187,15 @@ class TupleStore(dict):
         If alphas is None, the alphabet(s) are inferred from the provided entries.
         If entries is None, all entries are defined by possible combinations of symbols from specified alphabets,
         and are assumed to be None until specified. Either alphas or entries must be supplied.
-        If sparse is True, a sparse memory-saving encoding is used, if false, a time-saving, more flexible encoding is used.
+        If sparse is True, a sparse memory-saving encoding is used, if false, a time-saving, more flexible encoding is used:
+        a numeric array with one dimension per symbol position, indexed by alphabet codes, where entries not specified
+        are 0 rather than None.
         >>> matrix = TupleStore({'AA': 2, 'AW': -3, 'WW': 4, 'AR': -1})
         >>> matrix[('A', 'W')]
         -3
         >>> matrix['AR']
         -1
         """
-        assert sparse, "Currently only sparse encoding is implemented."
         assert alphas or entries, "Either alphabets or entries (from which alphabets can be inferred) must be supplied."
         self.sparse = sparse         # sparse encoding if true
         if alphas == None:
@@ -170,7 +211,7 @@ class TupleStore(dict):
         # Check if entries are supplied to the constructor
         if entries == None:
             self.entries = entries = {}
-        elif type(entries) is dict:
+        elif type(entries) is not dict:
             raise RuntimeError("When specified, entries must be a dictionary")
         # Check length of tuples, must be the same for all
         for entry in entries:
@@ -194,6 +235,11 @@ class TupleStore(dict):
         if self.alphas == None:     # if not specified to constructor use those we found
             self.alphas = tuple(myalphas)
 
+        if not sparse:
+            self.entries = None
+            self.array = np.zeros(tuple(len(alpha) for alpha in self.alphas))
+        else:
+            self.entries = {}
         for key in entries:
             self[key] = entries[key]
 
@@ -203,14 +249,26 @@ class TupleStore(dict):
                 return False
         return True
 
+    def _index(self, symkey):
+        """ Return the array index of symkey (dense encoding only); None symbols select all entries of their position """
+        return tuple(slice(None) if symkey[idx] == None else self.alphas[idx].index(symkey[idx])
+                     for idx in range(self.keylen))
+
     def __setitem__(self, symkey, value):
         assert self.keylen == len(symkey), "All entries in dictionary must be equally long"
         assert self._isValid(symkey), "Invalid symbol in entry"
+        if not self.sparse:
+            self.array[self._index(symkey)] = 0.0 if value == None else value
+            return
         self.entries[symkey] = value
 
     def __getitem__(self, symkey):
         """ Return the score matching the given symbols together."""
         assert self.keylen == len(symkey), "Entries must be of the same length"
+        if not self.sparse:
+            if any(sym == None for sym in symkey):
+                return None
+            return float(self.array[self._index(symkey)])
         try:
             return self.entries[symkey]
         except KeyError:
@@ -219,6 +277,9 @@ class TupleStore(dict):
     def __iadd__(self, symkey, ivalue):
         assert self.keylen == len(symkey), "All entries in dictionary must be equally long"
         assert self._isValid(symkey), "Invalid symbol in entry"
+        if not self.sparse:
+            self.array[self._index(symkey)] += ivalue
+            return
         try:
             self.entries[symkey] += ivalue
         except KeyError:
@@ -227,11 +288,24 @@ class TupleStore(dict):
     def __isub__(self, symkey, ivalue):
         assert self.keylen == len(symkey), "All entries in dictionary must be equally long"
         assert self._isValid(symkey), "Invalid symbol in entry"
+        if not self.sparse:
+            self.array[self._index(symkey)] -= ivalue
+            return
         try:
             self.entries[symkey] -= ivalue
         except KeyError:
             self.entries[symkey] = -ivalue
 
+    def sum(self, symkey=None):
+        """ Return the sum of the values matching the given symbols together (dense encoding only).
+        symkey: tuple (or list) of symbols or None (any symbol); if None, all entries are summed over.
+        """
+        assert not self.sparse, "Sums are only implemented for the dense encoding"
+        if symkey == None:
+            return float(self.array.sum())
+        assert self.keylen == len(symkey), "Entries must be of the same length"
+        return float(self.array[self._index(symkey)].sum())
+
     def getAll(self, symkey=None):
         """ Return the values matching the given symbols together.
         symkey: tuple (or list) of symbols or None (symcount symbol); if tuple is None, all entries are iterated over.
@@ -256,9 +330,13 @@ class TupleStore(dict):
         If sort is True, entries are sorted in descending order of value.
         Note that this function should NOT be used for big (>5 variables) tables."""
         ret = []
-        for s in self.entries:
-            if self[s] != None:
-                ret.append((s, self[s]))
+        if not self.sparse:
+            for ndx in zip(*np.nonzero(self.array)):
+                ret.append((tuple(self.alphas[i][ndx[i]] for i in range(self.keylen)), float(self.array[ndx])))
+        else:
+            for s in self.entries:
+                if self[s] != None:
+                    ret.append((s, self[s]))
         if sort:
             return sorted(ret, key=lambda v: v[1], reverse=True)
         return ret
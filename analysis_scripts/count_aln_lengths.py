@@ -26,10 +26,21 @@ for folder_name in folders:
 	for aln_file in os.listdir(folder_name):
 		if not aln_file.startswith("."):
 			try:
-				aln = read_clustal_file(folder_name + "/" + aln_file, Protein_Alphabet)
+				aln_path = folder_name + "/" + aln_file
+				# Binary copies (gradual_alignment.py --binary) load without parsing; skip their CLUSTAL files,
+				# unless the copy is older (left by an earlier run)
+				base_path = os.path.splitext(aln_path)[0]
+				if aln_file.endswith(".bin"):
+					if os.path.exists(base_path + ".txt") and os.path.getmtime(base_path + ".txt") > os.path.getmtime(aln_path):
+						continue
+					aln = read_binary_file(aln_path, Protein_Alphabet)
+				elif os.path.exists(base_path + ".bin") and os.path.getmtime(base_path + ".bin") >= os.path.getmtime(aln_path):
+					continue
+				else:
+					aln = read_clustal_file(aln_path, Protein_Alphabet, encoded=True)
 				if do_entropy:
-					trimmed_aln = aln.get_ungapped_using_reference("aspni-hyl1")
-					col_entropies = [trimmed_aln.get_shannon_entropy(p) for p in xrange(trimmed_aln.alignlen)]
+					trimmed_aln = aln.get_ungapped_using_reference("aspni-hyl1", view=True)
+					col_entropies = trimmed_aln.get_column_entropies().tolist()
 					mut_pos_entropies = [col_entropies[p-1] for p in mutation_positions]
 					trimmed_length = len(trimmed_aln)
 					print "%s\t%i\t%i\t%.3f\t%.3f\t%s\t%0.3f" % (folder_name, len(aln), aln.alignlen, 
@@ -0,0 +1,215 @@
+"""
+Measure every alignment saved by gradual_alignment.py under a directory, using a pool of processes.
+
+Alignments are found at any depth as <method>/<method>_<sequences>.txt (CLUSTAL) or .bin (binary copies, preferred
+when both exist and the copy is up to date), the method being the name of the file's folder; other files, e.g.,
+manifests, are ignored. Writes one tab-delimited row per alignment, in the columns of count_aln_lengths.py (sorted by
+method and number of sequences), and lists files that could not be measured, with the reason, separately. With
+--cache, measures are kept between runs and only new or changed files are measured.
+
+Example:
+    python measure_alignments.py -d gradual_out/ -r aspni-hyl1 -p 215 219 244 249 317 318 349 350 -o measures.txt
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sequence import *
+
+ALIGNMENT_FILE = re.compile(r"^(.+)_(\d+)\.(txt|bin)$")
+
+
+def _has_current_binary(path):
+    """
+    :return: True if the CLUSTAL file at path has a binary copy at least as recent as itself
+    """
+    binary_path = os.path.splitext(path)[0] + ".bin"
+    if not os.path.exists(binary_path):
+        return False
+    return not os.path.exists(path) or os.path.getmtime(binary_path) >= os.path.getmtime(path)
+
+def find_alignments(directory):
+    """
+    :return: List of (method, number of sequences, path) for the alignment files under directory
+    """
+    found = []
+    for dir_path, dir_names, file_names in os.walk(directory):
+        dir_names[:] = sorted(name for name in dir_names if not name.startswith("."))
+        for file_name in sorted(file_names):
+            match = ALIGNMENT_FILE.match(file_name)
+            method = os.path.basename(os.path.abspath(dir_path))
+            if file_name.startswith(".") or not match or match.group(1) != method:
+                continue
+            path = os.path.join(dir_path, file_name)
+            if match.group(3) == "txt" and _has_current_binary(path):
+                continue
+            if match.group(3) == "bin" and not _has_current_binary(path[:-4] + ".txt"):
+                continue
+            found.append((method, int(match.group(2)), path))
+    return found
+
+def measure_alignment(job):
+    """
+    Measure one alignment file
+    :param job: Tuple of (method, number of sequences, path, reference name or None, positions or None)
+    :return: (method, sequences, path, output columns, None), or (..., None, reason) if it could not be measured
+    """
+    method, cnt, path, reference, positions = job
+    try:
+        if path.endswith(".bin"):
+            aln = read_binary_file(path, Protein_Alphabet)
+        else:
+            aln = read_clustal_file(path, Protein_Alphabet, encoded=True)
+        # Aligners killed part way through leave truncated files behind
+        if len(aln) != cnt:
+            return method, cnt, path, None, "%i sequences found, expected %i" % (len(aln), cnt)
+        if positions is None:
+            return method, cnt, path, ["%i" % aln.alignlen, "%0.3f" % (float(len(aln)) / aln.alignlen)], None
+        trimmed_aln = aln.get_ungapped_using_reference(reference, view=True) if reference else aln
+        col_entropies = trimmed_aln.get_column_entropies().tolist()
+        mut_pos_entropies = [col_entropies[p - 1] for p in positions]
+        mean_mut_entropy = np.mean(mut_pos_entropies) if positions else float("nan")
+        columns = ["%i" % aln.alignlen, "%.3f" % np.mean(col_entropies), "%.3f" % mean_mut_entropy] + \
+                  map(str, mut_pos_entropies) + ["%0.3f" % (float(len(aln)) / trimmed_aln.alignlen)]
+        return method, cnt, path, columns, None
+    except Exception as e:
+        return method, cnt, path, None, "%s: %s" % (type(e).__name__, e)
+
+class MeasurementCache(object):
+    """
+    Measures of previous runs, kept in a JSON file. Entries are keyed by the alignment's path and the measurement
+    parameters, and only used while the file's fingerprint (size and modification time, or content hash) is
+    unchanged.
+    """
+
+    def __init__(self, filename, params, use_hash=False):
+        """
+        :param filename: Cache file, created if missing
+        :param params: The measurement parameters (e.g., reference and positions), must be JSON serialisable
+        :param use_hash: Fingerprint files by size and SHA-1 of their content rather than size and modification time,
+        e.g., for trees that are copied around
+        """
+        self.filename = filename
+        self.params = json.dumps(params, sort_keys=True)
+        self.use_hash = use_hash
+        self.entries = {}
+        if os.path.exists(filename):
+            with open(filename, 'r') as fh:
+                self.entries = json.load(fh)
+
+    def fingerprint(self, path):
+        stat = os.stat(path)
+        if not self.use_hash:
+            return [stat.st_size, stat.st_mtime]
+        digest = hashlib.sha1()
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), ''):
+                digest.update(chunk)
+        return [stat.st_size, digest.hexdigest()]
+
+    def _key(self, path):
+        return "%s\t%s" % (os.path.abspath(path), self.params)
+
+    def get(self, path, fingerprint):
+        """
+        :return: The cached (output columns, reason) of path, None if missing or the file has changed
+        """
+        entry = self.entries.get(self._key(path))
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return None
+        return entry["columns"], entry["reason"]
+
+    def put(self, path, fingerprint, columns, reason):
+        self.entries[self._key(path)] = {"fingerprint": fingerprint, "columns": columns, "reason": reason}
+
+    def save(self):
+        """ Write the cache, dropping entries of files that no longer exist """
+        for key in [key for key in self.entries if not os.path.exists(key.split("\t")[0])]:
+            del self.entries[key]
+        # Written then renamed, so an interrupted save leaves the previous cache intact
+        with open(self.filename + ".tmp", 'w') as fh:
+            json.dump(self.entries, fh)
+        os.rename(self.filename + ".tmp", self.filename)
+
+def _header(positions):
+    if positions is None:
+        return ["Method", "Seqs", "Length", "Lratio"]
+    return ["Method", "Seqs", "Length", "MeanEnt", "MeanMutEnt"] + ["P%i_Ent" % p for p in positions] + ["Lratio"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measures the length and column entropy of each alignment saved by '
+                                                 'gradual_alignment.py')
+    parser.add_argument('-d', '--directory', help='Directory to search for alignments (e.g., the output location '
+                                                  'of gradual_alignment.py)', required=True)
+    parser.add_argument('-o', '--output', help='Output file, standard output if not given', required=False)
+    parser.add_argument('-r', '--reference', required=False,
+                        help='Name of the reference sequence; entropies are measured over its ungapped columns '
+                             '(all columns if not given)')
+    parser.add_argument('-p', '--positions', type=int, nargs='*', required=False,
+                        help='Positions (1-based, in reference-trimmed columns) to report the entropy of; '
+                             'without this option only lengths are measured')
+    parser.add_argument('--corrupt', required=False,
+                        help='File listing alignments that could not be measured, default OUTPUT.corrupt.txt, '
+                             'or standard error without --output')
+    parser.add_argument('--cache', required=False,
+                        help='File keeping measures between runs, so only new or changed alignments are measured')
+    parser.add_argument('--cache_hash', action='store_true',
+                        help='Recognise unchanged alignments by their content rather than size and modification time')
+    parser.add_argument('-j', '--processes', type=int, default=multiprocessing.cpu_count(),
+                        help='Number of processes measuring alignments')
+    args = parser.parse_args()
+
+    cache = MeasurementCache(args.cache, [args.reference, args.positions], args.cache_hash) if args.cache else None
+    results = []
+    jobs = []
+    fingerprints = {}
+    for method, cnt, path in find_alignments(args.directory):
+        if cache:
+            fingerprints[path] = cache.fingerprint(path)
+            cached = cache.get(path, fingerprints[path])
+            if cached is not None:
+                results.append((method, cnt, path) + tuple(cached))
+                continue
+        jobs.append((method, cnt, path, args.reference, args.positions))
+    if jobs:
+        pool = multiprocessing.Pool(max(1, min(args.processes, len(jobs))))
+        try:
+            # Small chunks keep all processes busy, alignments growing along the list
+            for result in pool.imap_unordered(measure_alignment, jobs, chunksize=4):
+                results.append(result)
+                if cache:
+                    cache.put(result[2], fingerprints[result[2]], result[3], result[4])
+        finally:
+            pool.terminate()
+            pool.join()
+    if cache:
+        cache.save()
+    results.sort(key=lambda x: x[:3])
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    out.write("\t".join(_header(args.positions)) + "\n")
+    corrupt = []
+    for method, cnt, path, columns, reason in results:
+        if columns is None:
+            corrupt.append((path, reason))
+        else:
+            out.write("\t".join([method, str(cnt)] + columns) + "\n")
+    if args.output:
+        out.close()
+
+    corrupt_file = args.corrupt or (args.output + ".corrupt.txt" if args.output else None)
+    fh = open(corrupt_file, 'w') if corrupt_file else sys.stderr
+    for path, reason in corrupt:
+        fh.write("%s\t%s\n" % (path, reason))
+    if corrupt_file:
+        fh.close()
+    print >> sys.stderr, "Measured %i alignments (%i from cache), %i could not be measured" % \
+                         (len(results) - len(corrupt), len(results) - len(jobs), len(corrupt))
@@ -0,0 +1,49 @@
+"""
+Score every alignment saved by gradual_alignment.py under a directory (e.g., one method's output folder) against a
+reference alignment, such as a curated BAliBASE-style alignment of some of the sequences, using a pool of processes.
+
+Writes one tab-delimited row per alignment with the number of sequences it shares with the reference and its
+sum-of-pairs (SP) and total-column (TC) scores over them (see consistency.py; NA while fewer than two sequences are
+shared). Files that could not be scored are listed separately, with the reason.
+
+Example:
+    python score_reference.py -r reference.aln -d gradual_out/linsi -o linsi_scores.txt
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+from measure_alignments import find_alignments
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from consistency import *
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Scores alignments of gradual_alignment.py against a reference '
+                                                 'alignment')
+    parser.add_argument('-r', '--reference', help='Reference alignment (CLUSTAL, or the binary format of '
+                                                  'sequence.py)', required=True)
+    parser.add_argument('-d', '--directory', help='Directory to search for alignments', required=True)
+    parser.add_argument('-o', '--output', help='Output file, standard output if not given', required=False)
+    parser.add_argument('-j', '--processes', type=int, default=multiprocessing.cpu_count(),
+                        help='Number of processes scoring alignments')
+    args = parser.parse_args()
+
+    alignments = find_alignments(args.directory)
+    scores = score_files(args.reference, [path for _, _, path in alignments], args.processes)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    out.write("Method\tSeqs\tShared\tSP\tTC\n")
+    failed = 0
+    for (method, cnt, path), (_, sp, tc, shared, reason) in sorted(zip(alignments, scores)):
+        if reason is not None:
+            failed += 1
+            print >> sys.stderr, "%s\t%s" % (path, reason)
+            continue
+        values = ["NA", "NA"] if sp is None else ["%.4f" % sp, "%.4f" % tc]
+        out.write("\t".join([method, str(cnt), str(shared)] + values) + "\n")
+    if args.output:
+        out.close()
+    print >> sys.stderr, "Scored %i alignments, %i could not be scored" % (len(scores) - failed, failed)
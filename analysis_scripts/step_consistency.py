@@ -0,0 +1,136 @@
+"""
+Measure how the alignments saved by gradual_alignment.py change as sequences are added: compares the alignment of
+each step with that of a later step of the same method, on the sequences they share (those of the earlier step),
+using a pool of processes. Each process is given runs of pairs in which the later step of one pair is the earlier
+step of the next, so most alignments are read and indexed once.
+
+Writes one tab-delimited row per pair of steps, with the sum-of-pairs (SP) and total-column (TC) agreement of the
+later alignment with the earlier one (see consistency.py). Pairs that could not be compared are listed separately,
+with the reason.
+
+Example:
+    python step_consistency.py -d gradual_out/ --skip 100 -o consistency.txt
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+
+from measure_alignments import find_alignments
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from consistency import *
+
+
+def step_pairs(alignments, skip=None):
+    """
+    :param alignments: List of (method, number of sequences, path), see find_alignments
+    :param skip: Compare each step with the step of skip more sequences, None for the next step
+    :return: List of (method, sequences, later sequences, path, later path)
+    """
+    by_method = {}
+    for method, cnt, path in alignments:
+        by_method.setdefault(method, {})[cnt] = path
+    pairs = []
+    for method in sorted(by_method):
+        steps = by_method[method]
+        cnts = sorted(steps)
+        for ndx, cnt in enumerate(cnts):
+            later = cnt + skip if skip else (cnts[ndx + 1] if ndx + 1 < len(cnts) else None)
+            if later in steps:
+                pairs.append((method, cnt, later, steps[cnt], steps[later]))
+    return pairs
+
+def step_runs(pairs, run_length):
+    """
+    Group pairs of steps into runs in which the later step of each pair is the earlier step of the next
+    :param pairs: List of pairs, see step_pairs
+    :param run_length: Maximum number of pairs per run
+    :return: List of runs, each a list of pairs
+    """
+    runs = []
+    open_runs = {} # keyed by (method, sequences) of the step that would continue the run
+    for pair in pairs:
+        run = open_runs.pop(pair[:2], None)
+        if run is None:
+            run = []
+            runs.append(run)
+        run.append(pair)
+        if len(run) < run_length:
+            open_runs[(pair[0], pair[2])] = run
+    return runs
+
+def _index(path, indexes):
+    if path not in indexes:
+        indexes[path] = ResidueIndex(read_alignment_file(path, Protein_Alphabet))
+    return indexes[path]
+
+def compare_steps(pair, indexes=None):
+    """
+    :param pair: Tuple of (method, sequences, later sequences, path, later path)
+    :param indexes: Dictionary of ResidueIndex objects by path to reuse, added to with those built
+    :return: (pair, output columns, None), or (pair, None, reason) if the steps could not be compared
+    """
+    indexes = {} if indexes is None else indexes
+    try:
+        sp, tc, shared = compare(_index(pair[3], indexes), _index(pair[4], indexes))
+        if sp is None:
+            return pair, None, "no aligned residue pairs to compare"
+        return pair, ["%i" % shared, "%.4f" % sp, "%.4f" % tc], None
+    except Exception as e:
+        return pair, None, "%s: %s" % (type(e).__name__, e)
+
+def compare_run(run):
+    """
+    :param run: List of pairs, see step_runs
+    :return: List of the results of compare_steps for each pair
+    """
+    results = []
+    indexes = {}
+    for pair in run:
+        results.append(compare_steps(pair, indexes))
+        # Only the later step is used again, as the earlier step of the next pair
+        for path in indexes.keys():
+            if path != pair[4]:
+                del indexes[path]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measures the agreement between alignments of consecutive steps of '
+                                                 'gradual_alignment.py')
+    parser.add_argument('-d', '--directory', help='Directory to search for alignments (e.g., the output location '
+                                                  'of gradual_alignment.py)', required=True)
+    parser.add_argument('-o', '--output', help='Output file, standard output if not given', required=False)
+    parser.add_argument('--skip', type=int, required=False,
+                        help='Compare the step of N sequences with the step of N + SKIP sequences, rather than with '
+                             'the next step')
+    parser.add_argument('-j', '--processes', type=int, default=multiprocessing.cpu_count(),
+                        help='Number of processes comparing alignments')
+    args = parser.parse_args()
+
+    pairs = step_pairs(find_alignments(args.directory), args.skip)
+    processes = max(1, min(args.processes, len(pairs) or 1))
+    # Several runs per process, so all processes are kept busy; each run boundary reads one alignment twice
+    runs = step_runs(pairs, max(1, int(math.ceil(len(pairs) / (4.0 * processes)))))
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = sorted((result for run_results in pool.imap_unordered(compare_run, runs)
+                          for result in run_results), key=lambda x: x[0][:3])
+    finally:
+        pool.terminate()
+        pool.join()
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    out.write("Method\tSeqs\tNextSeqs\tShared\tSP\tTC\n")
+    failed = 0
+    for pair, columns, reason in results:
+        if columns is None:
+            failed += 1
+            print >> sys.stderr, "%s\t%s\t%s" % (pair[3], pair[4], reason)
+        else:
+            out.write("\t".join([pair[0], str(pair[1]), str(pair[2])] + columns) + "\n")
+    if args.output:
+        out.close()
+    print >> sys.stderr, "Compared %i pairs of steps, %i could not be compared" % (len(results) - failed, failed)
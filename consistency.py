@@ -0,0 +1,139 @@
+"""
+Module compares alignments of the same sequences, e.g., the alignments of consecutive steps of a gradual alignment,
+or an alignment and a reference (gold-standard) alignment.
+
+Two scores are computed over the sequences the alignments share, as in BAliBASE:
+the sum-of-pairs (SP) score, the fraction of residue pairs aligned in the reference alignment that are also aligned
+in the test alignment; and the total-column (TC) score, the fraction of reference columns (of at least two residues)
+that the test alignment reproduces exactly.
+
+Each alignment is indexed once (ResidueIndex), listing the column of every residue. Aligned pairs are then counted
+by grouping residues on their (reference column, test column) pair, rather than by comparing sequences pairwise.
+"""
+__author__ = 'julianzaugg'
+
+import multiprocessing
+
+import numpy as np
+
+from sequence import *
+
+GAP_CHARACTERS = "-."
+# ResidueIndex of the reference alignment while scoring many files, see score_files
+_REFERENCE = None
+
+
+class ResidueIndex(object):
+    """
+    The column of every residue of an alignment. Residues are listed sequence by sequence, so residue r of sequence
+    s is entry offsets[s] + r.
+    """
+
+    def __init__(self, aln):
+        """
+        :param aln: Alignment
+        """
+        residues = np.ones(aln.matrix.shape, dtype=bool)
+        for gap in GAP_CHARACTERS:
+            residues &= aln.matrix != ord(gap)
+        self.names = list(aln.names)
+        self.rows = dict((name, row) for row, name in enumerate(self.names))
+        self.alignlen = aln.alignlen
+        self.lengths = residues.sum(axis=1)
+        self.offsets = np.concatenate(([0], np.cumsum(self.lengths)))
+        self.columns = np.nonzero(residues)[1] # in row-major order, i.e., sequence by sequence
+        self._column_sizes = None
+
+    def column_sizes(self):
+        """ Return the number of residues in each column, counted once """
+        if self._column_sizes is None:
+            self._column_sizes = np.bincount(self.columns, minlength=self.alignlen).astype(np.int64)
+        return self._column_sizes
+
+    def subset(self, names):
+        """
+        Return the columns and number of residues of the specified sequences
+        :param names: Names of sequences, in the order their residues are to be listed
+        :return: Array of the column of each residue (sequence by sequence), array of residues per sequence
+        """
+        rows = [self.rows[name] for name in names]
+        if rows == range(len(self.names)):
+            return self.columns, self.lengths
+        columns = np.concatenate([self.columns[self.offsets[row]:self.offsets[row + 1]] for row in rows])
+        return columns, self.lengths[rows]
+
+
+def compare(reference, test):
+    """
+    Score a test alignment against a reference alignment, over the sequences they share
+    :param reference: ResidueIndex of the reference alignment
+    :param test: ResidueIndex of the test alignment
+    :return: Tuple of (SP score, TC score, number of shared sequences); scores are None without any pairs of
+    residues to compare
+    """
+    shared = [name for name in reference.names if name in test.rows]
+    ref_columns, ref_lengths = reference.subset(shared)
+    test_columns, test_lengths = test.subset(shared)
+    if (ref_lengths != test_lengths).any():
+        name = shared[np.flatnonzero(ref_lengths != test_lengths)[0]]
+        raise ValueError("Sequence %s has different residues in the two alignments" % name)
+    if len(shared) < 2:
+        return None, None, len(shared)
+
+    # Residues are listed in the same order for both alignments, so residue i of one is residue i of the other
+    keys, key_sizes = np.unique(ref_columns.astype(np.int64) * test.alignlen + test_columns, return_counts=True)
+    key_sizes = key_sizes.astype(np.int64)
+    if len(shared) == len(reference.names):
+        ref_sizes = reference.column_sizes()
+    else:
+        ref_sizes = np.bincount(ref_columns, minlength=reference.alignlen).astype(np.int64)
+    ref_pairs = (ref_sizes * (ref_sizes - 1) / 2).sum()
+    shared_pairs = (key_sizes * (key_sizes - 1) / 2).sum()
+
+    # A reference column is reproduced if its residues make up one whole test column
+    test_sizes = np.bincount(test_columns, minlength=test.alignlen)
+    key_ref_columns = keys // test.alignlen
+    test_columns_per_ref = np.bincount(key_ref_columns, minlength=reference.alignlen)
+    whole = (test_columns_per_ref[key_ref_columns] == 1) & (test_sizes[keys % test.alignlen] == key_sizes) & \
+            (key_sizes > 1)
+    ref_columns_scored = (ref_sizes > 1).sum()
+    if not ref_pairs:
+        return None, None, len(shared)
+    return float(shared_pairs) / ref_pairs, float(whole.sum()) / ref_columns_scored, len(shared)
+
+def compare_files(reference_file, test_file, alpha=Protein_Alphabet):
+    """
+    Score the alignment in test_file against the one in reference_file, see compare
+    """
+    return compare(ResidueIndex(read_alignment_file(reference_file, alpha)),
+                   ResidueIndex(read_alignment_file(test_file, alpha)))
+
+def _score_job(job):
+    filename, alpha = job
+    try:
+        return (filename,) + compare(_REFERENCE, ResidueIndex(read_alignment_file(filename, alpha))) + (None,)
+    except Exception as e:
+        return filename, None, None, 0, "%s: %s" % (type(e).__name__, e)
+
+def score_files(reference_file, filenames, processes=1, alpha=Protein_Alphabet):
+    """
+    Score many alignments against one reference alignment, e.g., a BAliBASE-style gold standard. The reference is
+    read and indexed once, and shared with the worker processes (which inherit it when forked) rather than sent to
+    them.
+    :param reference_file: Reference alignment, CLUSTAL or binary format
+    :param filenames: Alignment files to score
+    :param processes: Number of processes scoring alignments
+    :return: List of (filename, SP score, TC score, shared sequences, reason), in the order of filenames; reason is
+    None unless the file could not be scored
+    """
+    global _REFERENCE
+    _REFERENCE = ResidueIndex(read_alignment_file(reference_file, alpha))
+    jobs = [(filename, alpha) for filename in filenames]
+    if processes > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(processes, len(jobs)))
+        try:
+            return pool.map(_score_job, jobs, chunksize=4)
+        finally:
+            pool.terminate()
+            pool.join()
+    return map(_score_job, jobs)
@@ -0,0 +1,136 @@
+"""
+Module measures co-variation between the columns of an alignment: the mutual information (MI) of all pairs of
+columns, or of a chosen subset, optionally with the average product correction (APC) of Dunn et al. (2008).
+
+Columns are counted in states: one per symbol of the alignment's alphabet, plus one shared by gaps, wildcards and
+other characters. Pairs of columns are counted a tile of columns against another at a time, as one product of their
+one-hot encodings, so memory is bounded by the tile size rather than the alignment length. Tiles can be spread over
+a pool of processes.
+
+Example, the 10 most co-varying pairs of columns of an alignment:
+    aln = read_clustal_file("linsi/linsi_1002.txt", Protein_Alphabet)
+    mi = mutual_information(aln, processes=8)
+    print top_pairs(mi, 10)
+"""
+__author__ = 'julianzaugg'
+
+import math
+import multiprocessing
+
+from sequence import *
+
+# Set in each worker process of the pool, see _init_worker
+_STATES = None
+_NSTATES = None
+_PSEUDO = None
+
+
+def _states(aln, columns=None):
+    """
+    :return: Matrix (sequences x columns) of states, and the number of states
+    """
+    matrix = aln.matrix if columns is None else aln.matrix[:, list(columns)]
+    nsymbols = len(aln.alphabet)
+    return np.minimum(aln.alphabet.encode(matrix), nsymbols), nsymbols + 1
+
+def _one_hot(states, nstates):
+    """ Return the one-hot encoding (sequences x columns * states) of a matrix of states """
+    nseqs, ncols = states.shape
+    encoded = np.zeros((nseqs, ncols * nstates), dtype=np.float32)
+    encoded[np.arange(nseqs)[:, np.newaxis], np.arange(ncols) * nstates + states] = 1.0
+    return encoded
+
+def _tile_mi(states_i, states_j, nstates, pseudo):
+    """
+    :return: Matrix of the MI (natural log) between each column of states_i and each column of states_j
+    """
+    nseqs = states_i.shape[0]
+    # Counts are exact in single precision (up to 2^24 sequences), which halves the work of the product
+    counts = np.dot(_one_hot(states_i, nstates).T, _one_hot(states_j, nstates)).astype(np.float64)
+    # (columns i x columns j x state of i x state of j)
+    p_ij = counts.reshape(states_i.shape[1], nstates, states_j.shape[1], nstates).transpose(0, 2, 1, 3) / nseqs
+    if pseudo:
+        p_ij = (1.0 - pseudo) * p_ij + pseudo / nstates ** 2
+    p_i = p_ij.sum(axis=3)
+    p_j = p_ij.sum(axis=2)
+    expected = p_i[:, :, :, np.newaxis] * p_j[:, :, np.newaxis, :]
+    observed = p_ij > 0
+    terms = np.zeros_like(p_ij)
+    terms[observed] = p_ij[observed] * np.log(p_ij[observed] / expected[observed])
+    return terms.sum(axis=(2, 3))
+
+def _init_worker(states, nstates, pseudo):
+    global _STATES, _NSTATES, _PSEUDO
+    _STATES, _NSTATES, _PSEUDO = states, nstates, pseudo
+
+def _tile_job(job):
+    (i_start, i_end), (j_start, j_end) = job
+    return job, _tile_mi(_STATES[:, i_start:i_end], _STATES[:, j_start:j_end], _NSTATES, _PSEUDO)
+
+def mutual_information(aln, columns=None, apc=True, pseudo=0.0, base=None, tile=64, processes=1):
+    """
+    Compute the mutual information between pairs of columns of an alignment
+    :param aln: Alignment
+    :param columns: Indices (0-based) of the columns to compare, None for all columns
+    :param apc: Apply the average product correction, over the compared columns
+    :param pseudo: Fraction of uniform pseudo-frequency mixed into the pair frequencies, 0 for none
+    :param base: Base of the logarithm, None for natural logarithm
+    :param tile: Number of columns counted together; memory use grows with its square
+    :param processes: Number of processes counting tiles
+    :return: Symmetric matrix (columns x columns) of MI, or APC corrected MI; the diagonal is 0
+    """
+    states, nstates = _states(aln, columns)
+    ncols = states.shape[1]
+    tiles = [(start, min(start + tile, ncols)) for start in range(0, ncols, tile)]
+    jobs = [(tile_i, tile_j) for ndx, tile_i in enumerate(tiles) for tile_j in tiles[ndx:]]
+    if processes > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(processes, len(jobs)), _init_worker, (states, nstates, pseudo))
+        try:
+            results = pool.map(_tile_job, jobs)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        _init_worker(states, nstates, pseudo)
+        results = map(_tile_job, jobs)
+    mi = np.zeros((ncols, ncols))
+    for ((i_start, i_end), (j_start, j_end)), block in results:
+        mi[i_start:i_end, j_start:j_end] = block
+        mi[j_start:j_end, i_start:i_end] = block.T
+    # Tiles on the diagonal are only symmetric up to rounding
+    mi = (mi + mi.T) / 2
+    np.fill_diagonal(mi, 0.0)
+    if base:
+        mi /= math.log(base)
+    if apc:
+        mi = apc_correction(mi)
+    return mi
+
+def apc_correction(mi):
+    """
+    Apply the average product correction: subtract, from the MI of each pair, the product of the mean MI of its two
+    columns divided by the overall mean MI
+    :param mi: Symmetric matrix of MI, with a diagonal of 0
+    :return: Corrected matrix, with a diagonal of 0
+    """
+    ncols = len(mi)
+    if ncols < 3:
+        return mi.copy()
+    col_means = mi.sum(axis=0) / (ncols - 1)
+    mean = mi.sum() / (ncols * (ncols - 1))
+    if mean == 0:
+        return mi.copy()
+    corrected = mi - np.outer(col_means, col_means) / mean
+    np.fill_diagonal(corrected, 0.0)
+    return corrected
+
+def top_pairs(mi, n=20, columns=None):
+    """
+    :param mi: Matrix of (corrected) MI, see mutual_information
+    :param columns: The column indices mi was computed for, None if for all columns
+    :return: List of the n highest scoring (column, column, score) pairs, highest first
+    """
+    rows, cols = np.triu_indices(len(mi), 1)
+    order = np.argsort(-mi[rows, cols], kind='mergesort')[:n]
+    columns = range(len(mi)) if columns is None else list(columns)
+    return [(columns[rows[k]], columns[cols[k]], float(mi[rows[k], cols[k]])) for k in order]
@@ -1,6 +1,6 @@
 """
 Gradual alignment of sequences using alignment methods.
-Currently assumes MAFFT, MUSCLE and T-COFFEE installed to path (comment out or change paths
+Currently assumes MAFFT, MUSCLE and T-COFFEE installed to path (change paths in aligners.py
 as necessary; T-Coffee typically comes with with these other alignment tools provided)
 
 Will take a fasta file and do a gradual alignment of the sequences, storing the 
@@ -12,24 +12,69 @@ import argparse
 import subprocess
 import os
 import sys
+import shutil
+import tempfile
+import time
+import json
+import math
+import re
+import socket
+import signal
+import errno
+import multiprocessing
+import threading
+from multiprocessing.pool import ThreadPool
 
 from sequence import *
 from annotation import *
+from result_cache import AlignmentCache
+from aligners import ALIGNERS, DEFAULT_METHODS, get_aligner
+from job_queue import JobQueue, HEARTBEAT_INTERVAL
 
 OUT_LOCATION = "./"
 ANNOTATIONS = None
 ANNOTATION_DICT = None
 ORDER_ANNOTATION_NAME = None
+# Optional store of previously computed alignments, see result_cache.py
+CACHE = None
+# Record of (method, cnt) steps with complete alignments, kept in MANIFEST_FILE so runs can be resumed
+MANIFEST_FILE = None
+COMPLETED = set()
+MANIFEST_LOCK = threading.Lock()
+# Per-invocation record of aligner resource use, tab-delimited (or JSON lines if the name ends in .json)
+LOG_FILE = None
+LOG_FIELDS = ("method", "seqs", "mode", "residues", "wall", "user", "sys", "max_rss", "status", "out_bytes",
+              "complete")
+LOG_LOCK = threading.Lock()
+# Size-adaptive method selection: (method, "seqs" or "residues", threshold, replacement or None) rules, applied to
+# each step of at least threshold sequences/residues, see _select_method
+SWITCH_RULES = []
+PREFIX_RESIDUES = [0]
+# Seconds a job may run for; methods going over are stopped for all larger steps (STOPPED, the smallest such step)
+TIME_BUDGET = None
+STOPPED = {}
+BUDGET_LOCK = threading.Lock()
+# Measures of completed alignments, used for adaptive schedules, keyed by (method, cnt, measure)
+MEASURES = {}
+# Parent directory of per-job temporary directories, RAM-backed where available
+TEMP_LOCATION = None
+# Also save each complete alignment in the binary format of sequence.py (read_binary_file), next to its CLUSTAL file
+WRITE_BINARY = False
+# Serialises progress output from concurrent jobs
+PRINT_LOCK = threading.Lock()
+# Held while starting, reaping or signalling aligner processes, so no signal is sent once a process's pid may be
+# reused. RUNNING holds the aligner processes not yet reaped; once STOPPING is set, no more are started.
+PROCESS_LOCK = threading.RLock()
+RUNNING = set()
+STOPPING = False
+# Seconds between checks on a running aligner process, see _wait
+WAIT_INTERVAL = 0.05
 
-# Path locations for alignment algorithms, and additional parameters.
-# Currently assume mafft, muscle and t_coffee are install to path, but
-# comment out or change as desired.
-# {PATH : PARAMETERS}
-ALN_ALG_PATH_ARGS = {
-    "linsi": ["linsi", "--quiet", "--clustalout"], #Mafft
-    "muscle": ["muscle", "-maxiters 50", "-clw", "-clwstrict", "-quiet"],
-    "t_coffee": ["t_coffee", "-quiet", "-n_core=4"],
-}
+# Names of the temporary files that earlier versions wrote into the output location, see --resume
+OLD_TEMP_FILE = re.compile(r"^temp_(cur_seqs|prev_aln_.+_\d+|new_seqs_.+_\d+|cur_seqs_.+_\d+)\.txt(\.afa)?$")
+
+# Threads given to each threaded aligner, None for the aligner's default (see aligners.py)
+THREADS = None
 
 
 
@@ -61,13 +106,750 @@ def _dir_check(directory):
         raise StandardError("The directory %s does not exist or the location \
             was incorrectly specified" % directory)
 
+def _balance_cores(jobs, cores):
+    """
+    Share the available cores between concurrent jobs and the threading of aligners (e.g., t_coffee -n_core),
+    so that a full pool of threaded jobs does not oversubscribe the machine
+    :param jobs: Number of concurrent alignment jobs
+    :param cores: Number of cores available to the run
+    """
+    global THREADS
+    THREADS = max(1, cores / jobs)
+
+def _out_paths(prefix):
+    """
+    :return: Paths of the files in the output location with names starting with prefix. The output location is a
+    prefix of paths (OUT_LOCATION + name), so files of -o out/ are out/<name> and those of -o out are ./out<name>.
+    """
+    out_dir = os.path.dirname(OUT_LOCATION + prefix)
+    name_prefix = os.path.basename(OUT_LOCATION + prefix)
+    if not os.path.isdir(out_dir or "."):
+        return []
+    return [os.path.join(out_dir, file_name) for file_name in sorted(os.listdir(out_dir or "."))
+            if file_name.startswith(name_prefix)]
+
+def _out_file(method, cnt):
+    """
+    :return: Location of the CLUSTAL alignment of the first cnt sequences with method
+    """
+    return "%s%s/%s_%i.txt" % (OUT_LOCATION, method, method, cnt)
+
+def _kill_group(process):
+    """
+    Kill an aligner process and any processes it started (e.g., those of MAFFT's wrapper scripts), which share its
+    process group. The caller holds PROCESS_LOCK and has not reaped the process.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError: # already finished
+        pass
+
+def _write_input(process, stdin_data):
+    try:
+        process.stdin.write(stdin_data)
+        process.stdin.close()
+    except IOError: # aligner exited without reading its input
+        pass
+
+def _wait(process, deadline=None):
+    """
+    Wait for an aligner process to finish, killing its process group if it is still running at deadline.
+    The process is only reaped while holding PROCESS_LOCK, and is never signalled once reaped.
+    :param deadline: Time (as time.time) by which the process must finish, None for no limit
+    :return: Exit status and resource use of the process (as os.wait4), and whether it was killed
+    """
+    killed = False
+    while True:
+        with PROCESS_LOCK:
+            # wait4 rather than wait, to collect the resource use of this child alone
+            pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                RUNNING.discard(process)
+                return status, rusage, killed
+            if deadline is not None and not killed and time.time() >= deadline:
+                _kill_group(process)
+                killed = True
+        time.sleep(WAIT_INTERVAL)
+
+def _run_commands(commands, job_dir):
+    """
+    Run aligner commands in job_dir, piping each its standard input and writing its standard output
+    straight to the output file. Stops at the first command that fails. If TIME_BUDGET is set, commands
+    still running when the job's time is up are killed. Each command runs in a process group of its own, so that
+    killing it also kills the processes it started.
+    :param commands: List of (command arguments, standard input, standard output file) tuples
+    :return: Dictionary of resource use summed over the commands: wall time, user and system CPU time (seconds),
+    peak resident set size (as reported by getrusage, KB on Linux), the exit status of the last command run
+    and whether the job ran out of time
+    """
+    usage = {"wall": 0.0, "user": 0.0, "sys": 0.0, "max_rss": 0, "status": 0, "timed_out": False}
+    for command_args, stdin_data, stdout_file in commands:
+        out_fh = open(stdout_file, 'w') if stdout_file else None
+        start_time = time.time()
+        deadline = start_time + max(0.0, TIME_BUDGET - usage["wall"]) if TIME_BUDGET else None
+        try:
+            with PROCESS_LOCK:
+                if STOPPING:
+                    usage["status"] = -signal.SIGTERM
+                    return usage
+                process = subprocess.Popen(command_args, cwd=job_dir, stdout=out_fh, preexec_fn=os.setsid,
+                                           stdin=subprocess.PIPE if stdin_data is not None else None)
+                RUNNING.add(process)
+            writer = None
+            if stdin_data is not None:
+                # Written from another thread, so an aligner that stops reading its input is still killed on time
+                writer = threading.Thread(target=_write_input, args=(process, stdin_data))
+                writer.daemon = True
+                writer.start()
+            status, rusage, usage["timed_out"] = _wait(process, deadline)
+            if writer:
+                writer.join()
+        except OSError as e:
+            with PRINT_LOCK:
+                print >> sys.stderr, "Could not run %s: %s" % (command_args[0], e)
+            usage["status"] = 127
+            return usage
+        finally:
+            if out_fh:
+                out_fh.close()
+        process.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+        usage["wall"] += time.time() - start_time
+        usage["user"] += rusage.ru_utime
+        usage["sys"] += rusage.ru_stime
+        usage["max_rss"] = max(usage["max_rss"], rusage.ru_maxrss)
+        usage["status"] = process.returncode
+        if usage["timed_out"]:
+            with PRINT_LOCK:
+                print >> sys.stderr, "%s killed after exceeding the time budget of %gs" % (command_args[0],
+                                                                                       TIME_BUDGET)
+            break
+        if process.returncode != 0:
+            with PRINT_LOCK:
+                print >> sys.stderr, "%s exited with status %i" % (command_args[0], process.returncode)
+            break
+    return usage
+
+def _select_method(method, cnt):
+    """
+    Apply the SWITCH_RULES to the method requested for aligning the first cnt sequences
+    :return: Name of the method to use, None if the method is dropped at this size
+    """
+    used = set()
+    while method is not None and method not in used:
+        used.add(method)
+        for rule_method, measure, threshold, replacement in SWITCH_RULES:
+            size = cnt if measure == "seqs" else PREFIX_RESIDUES[cnt]
+            if rule_method == method and size >= threshold:
+                method = replacement
+                break
+        else:
+            break
+    return method
+
+def _is_stopped(method, cnt):
+    """
+    :return: True if method has gone over the time budget on cnt or fewer sequences; larger steps would too
+    """
+    with BUDGET_LOCK:
+        return method in STOPPED and cnt >= STOPPED[method]
+
+def _stop_method(method, cnt):
+    with BUDGET_LOCK:
+        STOPPED[method] = min(cnt, STOPPED.get(method, cnt))
+
+def _log_job(method, cnt, mode, seqs, usage, complete):
+    """
+    Append a record of one aligner invocation to LOG_FILE
+    :param mode: "align" or "add"
+    :param seqs: The sequences aligned
+    :param usage: Resource use as returned by _run_commands
+    :param complete: Whether the output is a complete alignment
+    """
+    if not LOG_FILE:
+        return
+    out_file = _out_file(method, cnt)
+    record = {"method": method, "seqs": cnt, "mode": mode,
+              "residues": sum(len(seq) for seq in seqs),
+              "wall": round(usage["wall"], 3), "user": round(usage["user"], 3), "sys": round(usage["sys"], 3),
+              "max_rss": usage["max_rss"], "status": usage["status"],
+              "out_bytes": os.path.getsize(out_file) if os.path.exists(out_file) else 0,
+              "complete": complete}
+    with LOG_LOCK:
+        with open(LOG_FILE, 'a') as fh:
+            if LOG_FILE.endswith(".json"):
+                fh.write(json.dumps(record, sort_keys=True) + "\n")
+            else:
+                fh.write("\t".join(str(record[field]) for field in LOG_FIELDS) + "\n")
+
+def _raw_out_file(aligner, cnt, job_dir):
+    """
+    :return: Where aligner should write its output: the CLUSTAL output file itself, or for aligners writing
+    another format, a file in job_dir that _convert_output turns into the CLUSTAL output
+    """
+    if aligner.output_format == "clustal":
+        return os.path.abspath(_out_file(aligner.name, cnt))
+    return os.path.join(job_dir, "out." + aligner.output_format)
+
+def _convert_output(aligner, raw_file, cnt):
+    if aligner.output_format == "fasta" and os.path.exists(raw_file) and os.path.getsize(raw_file) > 0:
+        Alignment(read_fasta_file(raw_file, Protein_Alphabet)).write_clustal_file(_out_file(aligner.name, cnt))
+
+def _ram_temp_dir():
+    """
+    :return: A RAM-backed directory for temporary files if the system has one, otherwise None
+    (the system default temporary directory)
+    """
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return None
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+def _make_temp_location(temp_dir=None):
+    """
+    Create the parent directory of this run's job directories, named by host and process id. Directories left
+    behind by killed runs on this host (whose process is no longer running) are removed first, as in RAM-backed
+    locations they hold on to memory.
+    :param temp_dir: Where to create it, None for a RAM-backed location if available
+    :return: Path of the new directory
+    """
+    parent = temp_dir or _ram_temp_dir() or tempfile.gettempdir()
+    prefix = "gradual_alignment.%s." % socket.gethostname()
+    for file_name in os.listdir(parent):
+        pid = file_name[len(prefix):].split(".")[0]
+        if file_name.startswith(prefix) and _isint(pid) and not _is_running(int(pid)):
+            shutil.rmtree(os.path.join(parent, file_name), ignore_errors=True)
+    return tempfile.mkdtemp(prefix="%s%i." % (prefix, os.getpid()), dir=parent)
+
+def _exit_on_sigterm(signum, frame):
+    """
+    Kill the running aligners, which would otherwise carry on writing outputs, and exit. Raised in the main thread,
+    so the run's temporary files are removed on the way out.
+    """
+    global STOPPING
+    with PROCESS_LOCK:
+        STOPPING = True
+        for process in RUNNING:
+            _kill_group(process)
+    raise SystemExit(128 + signum)
+
+def _job_dir(method, cnt):
+    """
+    :return: A new temporary directory for one job; aligners run in it, so files they write to the
+    working directory (e.g., t_coffee guide trees) do not collide between concurrent jobs
+    """
+    return tempfile.mkdtemp(prefix="%s_%i_" % (method, cnt), dir=TEMP_LOCATION)
+
+def _is_complete_alignment(filename, seqs):
+    """
+    Check that filename holds a complete CLUSTAL alignment of seqs, rather than just that it exists.
+    Aligners that are killed part way through leave empty or truncated files behind.
+    :param filename: CLUSTAL alignment file
+    :param seqs: The sequences that should have been aligned
+    :return: True if every sequence is present, complete and aligned to the same length
+    """
+    try:
+        with open(filename, 'r') as fh:
+            if not fh.readline().startswith("CLUSTAL"):
+                return False
+        aln = read_clustal_file(filename, Protein_Alphabet)
+    except (IOError, IndexError):
+        return False
+    if len(aln) != len(seqs) or any(len(s) != aln.alignlen for s in aln):
+        return False
+    # Names may be truncated by some aligners, so compare the residues
+    return sorted(s.sequence.replace("-", "").upper() for s in aln) == \
+           sorted(s.sequence.replace("-", "").upper() for s in seqs)
+
+def _load_manifest():
+    """
+    Load the (method, cnt) steps recorded as complete by previous runs into COMPLETED, from manifest.txt and
+    the manifests of queue workers (manifest.<worker>.txt) in the output location.
+    Entries are checked again when their step comes up, see _is_completed.
+    """
+    for manifest_file in _out_paths("manifest"):
+        if not manifest_file.endswith(".txt"):
+            continue
+        with open(manifest_file, 'r') as fh:
+            fh.readline() # header
+            for line in fh:
+                sections = line.rstrip("\n").split("\t")
+                # A run killed while writing may leave a partial last line
+                if len(sections) == 3 and _isint(sections[1]):
+                    COMPLETED.add((sections[0], int(sections[1])))
+
+def _start_records(resume, log_file):
+    """
+    Set up the manifest and job log, starting new files unless resuming
+    """
+    global LOG_FILE
+    LOG_FILE = log_file
+    if LOG_FILE and not LOG_FILE.endswith(".json") and (not resume or not os.path.exists(LOG_FILE)):
+        with open(LOG_FILE, 'w') as fh:
+            fh.write("\t".join(LOG_FIELDS) + "\n")
+    if resume:
+        _load_manifest()
+    if not resume or not os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE, 'w') as fh:
+            fh.write("Method\tSeqs\tFile\n")
+
+def _is_completed(method, cnt, seqs):
+    """
+    :return: True if the step was completed by a previous run and its output is still a complete alignment
+    """
+    if (method, cnt) not in COMPLETED:
+        return False
+    if _is_complete_alignment(_out_file(method, cnt), seqs):
+        return True
+    with PRINT_LOCK:
+        print "%s\t%i\t(recorded as complete, but output is incomplete; realigning)" % (method, cnt)
+    with MANIFEST_LOCK:
+        COMPLETED.discard((method, cnt))
+    return False
+
+def _clear_output(method, cnt):
+    """
+    Remove the output of a step, and its binary copy, before it is written again. The output may be a hard link to
+    a cache entry (--cache_link), which opening it for writing would overwrite.
+    """
+    out_file = _out_file(method, cnt)
+    for filename in [out_file, os.path.splitext(out_file)[0] + ".bin"]:
+        if os.path.lexists(filename):
+            os.remove(filename)
+
+def _fetch_cached(method, cnt, seqs, cache_key):
+    """
+    Complete a step with its alignment from the cache, if there is one. Cached alignments that are incomplete
+    are removed from the cache, and the step is realigned.
+    :return: True if the step was completed from the cache
+    """
+    out_file = _out_file(method, cnt)
+    if not CACHE.fetch(cache_key, out_file):
+        return False
+    if not _is_complete_alignment(out_file, seqs):
+        CACHE.reject(cache_key)
+        _clear_output(method, cnt)
+        with PRINT_LOCK:
+            print "%s\t%i\t(cached alignment is incomplete; realigning)" % (method, cnt)
+        return False
+    with PRINT_LOCK:
+        print "%s\t%i\t(cached)" % (method, cnt)
+    return _finish_job(method, cnt, seqs)
+
+def _finish_job(method, cnt, seqs, cache_key=None):
+    """
+    Record a step as complete in the manifest, and in the cache if one is used, provided its output is
+    a complete alignment
+    :return: True if the output is complete
+    """
+    out_file = _out_file(method, cnt)
+    if not _is_complete_alignment(out_file, seqs):
+        with PRINT_LOCK:
+            print >> sys.stderr, "%s\t%i\tfailed, %s is missing or incomplete" % (method, cnt, out_file)
+        return False
+    if CACHE and cache_key:
+        CACHE.store(cache_key, out_file)
+    binary_file = os.path.splitext(out_file)[0] + ".bin"
+    if WRITE_BINARY:
+        # Written then renamed, so readers never map a partial file
+        read_clustal_file(out_file, Protein_Alphabet, encoded=True).write_binary_file(binary_file + ".tmp")
+        os.rename(binary_file + ".tmp", binary_file)
+    elif os.path.exists(binary_file):
+        # Left by an earlier run with --binary; readers prefer it to the CLUSTAL file
+        os.remove(binary_file)
+    with MANIFEST_LOCK:
+        COMPLETED.add((method, cnt))
+        with open(MANIFEST_FILE, 'a') as fh:
+            fh.write("%s\t%i\t%s\n" % (method, cnt, out_file))
+    return True
+
+def _align_job(job):
+    """
+    Align one prefix of the input sequences with one method.
+    Each job works in its own temporary directory, so jobs can run concurrently.
+    :param job: Tuple of (method, cnt, sequences), method being the name of a registered aligner
+    :return: True if the step produced a complete alignment
+    """
+    method, cnt, cur_seqs = job
+    if _is_completed(method, cnt, cur_seqs):
+        return True
+    if _is_stopped(method, cnt):
+        with PRINT_LOCK:
+            print "%s\t%i\t(skipped, over the time budget)" % (method, cnt)
+        return False
+    aligner = get_aligner(method)
+    cache_key = None
+    if CACHE:
+        cache_key = CACHE.key(method, aligner.cache_args(), cur_seqs)
+        if _fetch_cached(method, cnt, cur_seqs, cache_key):
+            return True
+    _clear_output(method, cnt)
+    job_dir = _job_dir(method, cnt)
+    try:
+        with PRINT_LOCK:
+            print "%s\t%i" % (method, cnt)
+        raw_file = _raw_out_file(aligner, cnt, job_dir)
+        usage = _run_commands(aligner.commands(cur_seqs, raw_file, job_dir, THREADS), job_dir)
+        _convert_output(aligner, raw_file, cnt)
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+    if usage["timed_out"]:
+        _stop_method(method, cnt)
+    complete = _finish_job(method, cnt, cur_seqs, cache_key)
+    _log_job(method, cnt, "align", cur_seqs, usage, complete)
+    return complete
+
+def _add_job(method, prev_cnt, cnt, input_seqs, fragments=False, prev_method=None):
+    """
+    Align the first cnt sequences by adding input_seqs[prev_cnt:cnt] to the saved alignment of the
+    first prev_cnt sequences, rather than realigning from scratch.
+    :param prev_method: Method that made the saved alignment, if not method
+    :return: True if the step produced a complete alignment
+    """
+    if _is_completed(method, cnt, input_seqs[:cnt]):
+        return True
+    if _is_stopped(method, cnt):
+        with PRINT_LOCK:
+            print "%s\t%i\t(skipped, over the time budget)" % (method, cnt)
+        return False
+    aligner = get_aligner(method)
+    prev_file = _out_file(prev_method or method, prev_cnt)
+    cache_key = None
+    if CACHE:
+        mode = "%s:%s" % (method, "addfragments" if fragments else "add")
+        cache_key = CACHE.key(mode, aligner.cache_args(), input_seqs[prev_cnt:cnt], prev_file)
+        if _fetch_cached(method, cnt, input_seqs[:cnt], cache_key):
+            return True
+    # The saved alignment is CLUSTAL, the aligners want (gapped) FASTA
+    prev_aln = read_clustal_file(prev_file, Protein_Alphabet)
+    _clear_output(method, cnt)
+    job_dir = _job_dir(method, cnt)
+    try:
+        with PRINT_LOCK:
+            print "%s\t%i\t(adding to %i)" % (method, cnt, prev_cnt)
+        raw_file = _raw_out_file(aligner, cnt, job_dir)
+        commands = aligner.add_commands(prev_aln.seqs, input_seqs[prev_cnt:cnt], raw_file, job_dir, THREADS,
+                                        fragments)
+        usage = _run_commands(commands, job_dir)
+        _convert_output(aligner, raw_file, cnt)
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+    if usage["timed_out"]:
+        _stop_method(method, cnt)
+    complete = _finish_job(method, cnt, input_seqs[:cnt], cache_key)
+    _log_job(method, cnt, "add", input_seqs[:cnt], usage, complete)
+    return complete
+
+def _previous_step(method, cnt):
+    """
+    :return: The largest step below cnt completed so far with the method that method is switched to at that step,
+    as (method used, cnt), or (None, None) if there is none
+    """
+    with MANIFEST_LOCK:
+        done = [done_cnt for done_method, done_cnt in COMPLETED
+                if done_cnt < cnt and done_method == _select_method(method, done_cnt)]
+    if not done:
+        return None, None
+    return _select_method(method, max(done)), max(done)
+
+def _incremental_job(job):
+    """
+    Align increasing prefixes of the input sequences with one method, each step starting from
+    the alignment of the closest smaller step completed so far in the run (normally the step before it,
+    but e.g., when refining a schedule, an earlier one). Steps with no smaller completed step are aligned
+    from scratch, as are all steps of methods that can not add to an existing alignment (e.g., t_coffee).
+    Where SWITCH_RULES replace the method, the replacement continues from the last alignment; the
+    chain ends where the method is dropped, or replaced by a method with a chain of its own.
+    :param job: Tuple of (method, cnts, sequences, fragments, methods) where cnts are in increasing order
+    and methods are all the methods requested
+    """
+    method, cnts, input_seqs, fragments, methods = job
+    for cnt in cnts:
+        cur_method = _select_method(method, cnt)
+        if cur_method is None or (cur_method != method and cur_method in methods):
+            break
+        prev_method, prev_cnt = _previous_step(method, cnt)
+        if prev_cnt is None or not get_aligner(cur_method).can_add:
+            _align_job((cur_method, cnt, input_seqs[:cnt]))
+        else:
+            _add_job(cur_method, prev_cnt, cnt, input_seqs, fragments, prev_method)
+
+def _independent_jobs(cnts_by_method, input_seqs, methods):
+    """
+    :return: List of (method, cnt, sequences) jobs, one per (method, prefix size) pair once the switch rules
+    are applied
+    """
+    jobs = []
+    for cnt in sorted(set(cnt for method in methods for cnt in cnts_by_method[method])):
+        cnt_methods = []
+        for method in methods:
+            if cnt not in cnts_by_method[method]:
+                continue
+            cur_method = _select_method(method, cnt)
+            if cur_method and cur_method not in cnt_methods:
+                cnt_methods.append(cur_method)
+                jobs.append((cur_method, cnt, input_seqs[:cnt]))
+    return jobs
+
+def _run_jobs(cnts_by_method, input_seqs, methods, my_args):
+    """
+    Align the prefixes of input_seqs with each method, using a pool of my_args.jobs workers if more than one
+    :param cnts_by_method: Dictionary of the prefix sizes to align, keyed by requested method
+    :param methods: The requested methods, in order
+    """
+    if my_args.incremental:
+        # Steps of one method depend on each other, so each method is a single job
+        jobs = [(method, sorted(cnts_by_method[method]), input_seqs, my_args.add_fragments, methods)
+                for method in methods if cnts_by_method[method]]
+        job_function = _incremental_job
+    else:
+        jobs = _independent_jobs(cnts_by_method, input_seqs, methods)
+        job_function = _align_job
+        # Largest prefixes first, so the longest running jobs are not the last to start. With a time budget,
+        # smallest first instead (as listed), so that once a step runs out of time the larger steps of its method
+        # are still pending and get skipped, rather than all having started
+        if my_args.jobs > 1 and not TIME_BUDGET:
+            jobs.sort(key=lambda x: x[1], reverse=True)
+
+    if my_args.jobs > 1:
+        pool = ThreadPool(my_args.jobs)
+        try:
+            # Waiting on the async result (rather than map) keeps the run interruptible; one job at a time, so
+            # jobs start in the order listed
+            pool.map_async(job_function, jobs, chunksize=1).get(sys.maxint)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        map(job_function, jobs)
+
+def _schedule(kind, start, end, skip, ratio, points):
+    """
+    Return the prefix sizes to align, from start up to (not including) end
+    :param kind: "linear" for every skip-th size; "geometric" for sizes growing by ratio each step (and at
+    least skip); "log" for points log-spaced sizes; "adaptive" starts from "geometric", see _refine
+    """
+    if kind == "linear":
+        return range(start, end, skip)
+    if start >= end:
+        return []
+    if kind == "log":
+        # Rounding can step outside the range, e.g., below start
+        cnts = sorted(set(min(max(int(round(x)), start), end - 1)
+                          for x in np.logspace(math.log10(start), math.log10(end - 1), points)))
+    else:
+        cnts = []
+        cnt = start
+        while cnt < end:
+            cnts.append(cnt)
+            cnt = max(cnt + skip, int(math.ceil(cnt * ratio)))
+    # Always finish on the largest step, so the whole range is covered
+    if cnts and cnts[-1] != end - 1:
+        cnts.append(end - 1)
+    return cnts
+
+def _measure(method, cnt, measure):
+    """
+    :param measure: "length" for the alignment length, "entropy" for the mean column entropy
+    :return: The measure of the alignment of the first cnt sequences with method
+    """
+    key = (method, cnt, measure)
+    if key not in MEASURES:
+        aln = read_clustal_file(_out_file(method, cnt), Protein_Alphabet, encoded=True)
+        if measure == "length":
+            MEASURES[key] = float(aln.alignlen)
+        else:
+            MEASURES[key] = float(np.mean(aln.get_column_entropies()))
+    return MEASURES[key]
+
+def _refine(method, cnts, min_gap, measures, tolerance):
+    """
+    Find where to add steps for method: halfway between neighbouring completed steps whose alignments
+    differ by more than tolerance (relative change) in any of measures, unless they are min_gap or fewer
+    sequences apart
+    :param cnts: Prefix sizes attempted so far for method
+    :return: List of new prefix sizes
+    """
+    done = [cnt for cnt in sorted(cnts) if (_select_method(method, cnt), cnt) in COMPLETED]
+    new_cnts = []
+    for prev_cnt, cnt in zip(done, done[1:]):
+        mid_cnt = (prev_cnt + cnt) / 2
+        if cnt - prev_cnt <= min_gap or mid_cnt in cnts:
+            continue
+        for measure in measures.split(","):
+            prev_value = _measure(_select_method(method, prev_cnt), prev_cnt, measure)
+            value = _measure(_select_method(method, cnt), cnt, measure)
+            if abs(value - prev_value) > tolerance * max(abs(prev_value), 1e-9):
+                new_cnts.append(mid_cnt)
+                break
+    return new_cnts
+
+def _read_input(filename, max_seqs=None, order_key=None):
+    """
+    Read the input sequences. When only some are used (max_seqs), they are read through an index of the file
+    (written next to it, see FastaIndex), so that only those sequences are read into memory
+    :param max_seqs: Number of (ordered) sequences to keep, None for all
+    :param order_key: Function of the sequence name to order sequences by, None to keep file order
+    :return: List of Sequence objects
+    """
+    index = None
+    if max_seqs is not None:
+        try:
+            index = FastaIndex(filename, Protein_Alphabet)
+        except ValueError: # lines of varying length, which can not be indexed
+            pass
+    if index is None:
+        seqs = read_fasta_file(filename, Protein_Alphabet)
+        if order_key:
+            seqs = sorted(seqs, key=lambda x: order_key(x.name))
+        return seqs[:max_seqs]
+    ordinals = range(len(index))
+    if order_key:
+        ordinals = sorted(ordinals, key=lambda i: order_key(index.names[i]))
+    return index.get_sequences(ordinals[:max_seqs])
+
+def _run_queued_job(queue, job, input_seqs):
+    """
+    Run a job claimed from the queue and move it to done/ or failed/. The claim is kept fresh while the job runs,
+    so other workers do not requeue it, and a job raising an error fails rather than staying claimed.
+    """
+    finished = threading.Event()
+
+    def beat():
+        while not finished.wait(HEARTBEAT_INTERVAL):
+            queue.heartbeat(job)
+
+    heartbeat = threading.Thread(target=beat)
+    heartbeat.daemon = True
+    heartbeat.start()
+    try:
+        _make_dir(job["method"])
+        complete = _align_job((job["method"], job["cnt"], input_seqs[:job["cnt"]]))
+    except Exception as e:
+        with PRINT_LOCK:
+            print >> sys.stderr, "%s\t%i\tfailed, %s: %s" % (job["method"], job["cnt"], type(e).__name__, e)
+        complete = False
+    finally:
+        finished.set()
+        heartbeat.join()
+    if not queue.finish(job, complete):
+        with PRINT_LOCK:
+            print >> sys.stderr, "%s\t%i\twas requeued by another worker while running" % (job["method"], job["cnt"])
+
+def _run_worker(my_args):
+    """
+    Work through the jobs of a queue created with --queue, until none are left. Several workers, on any
+    machines sharing the queue and output locations, can work on one queue at the same time.
+    """
+    global OUT_LOCATION, CACHE, MANIFEST_FILE, TEMP_LOCATION, TIME_BUDGET, WRITE_BINARY
+    queue = JobQueue(my_args.worker)
+    settings = queue.settings()
+    OUT_LOCATION = settings["output"]
+    TIME_BUDGET = settings["time_budget"]
+    WRITE_BINARY = settings["binary"]
+    if settings["cache"]:
+        CACHE = AlignmentCache(settings["cache"], settings["cache_size"] * 1048576, settings["cache_link"])
+    # Each worker keeps its own manifest and log, so workers never append to the same file
+    worker_id = "%s_%i" % (socket.gethostname(), os.getpid())
+    MANIFEST_FILE = "%smanifest.%s.txt" % (OUT_LOCATION, worker_id)
+    _start_records(True, "%sjob_log.%s.txt" % (OUT_LOCATION, worker_id))
+    if my_args.requeue is not None:
+        print "Requeued %i stale jobs" % queue.requeue_stale(my_args.requeue)
+    if my_args.jobs > 1:
+        _balance_cores(my_args.jobs, my_args.cores)
+    input_seqs = read_fasta_file(queue.input_file, Protein_Alphabet)
+
+    def work(_):
+        while True:
+            job = queue.claim(worker_id)
+            if job is None:
+                return
+            _run_queued_job(queue, job, input_seqs)
+
+    TEMP_LOCATION = _make_temp_location(my_args.temp_dir)
+    try:
+        pool = ThreadPool(my_args.jobs)
+        try:
+            pool.map_async(work, range(my_args.jobs)).get(sys.maxint)
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        shutil.rmtree(TEMP_LOCATION, ignore_errors=True)
+    print "Queue %s: %s" % (my_args.worker, ", ".join("%i %s" % (n, state) for state, n in
+                                                      sorted(queue.counts().items())))
+    if CACHE:
+        print CACHE.report()
+
+def _parse_methods(my_parser, methods_string):
+    """
+    :param methods_string: Comma separated list of alignment methods, or "all"
+    :return: List of method names
+    """
+    if methods_string == "all":
+        return list(DEFAULT_METHODS)
+    methods = [method.strip() for method in methods_string.split(",") if method.strip()]
+    for method in methods:
+        if method not in ALIGNERS:
+            my_parser.error("Unknown alignment method %s, choose from %s or all" %
+                            (method, ", ".join(sorted(ALIGNERS))))
+    return methods
+
+def _parse_switch_rules(my_parser, switches):
+    """
+    :param switches: List of [method, measure, threshold, replacement] from the command line
+    :return: List of (method, measure, threshold, replacement) tuples, replacement None for dropping the method
+    """
+    rules = []
+    for method, measure, threshold, replacement in switches or []:
+        if measure not in ("seqs", "residues"):
+            my_parser.error("Switch measure must be seqs or residues, not %s" % measure)
+        if not _isint(threshold):
+            my_parser.error("Switch threshold must be a whole number, not %s" % threshold)
+        replacement = None if replacement.lower() == "none" else replacement
+        for name in [method, replacement]:
+            if name is not None and name not in ALIGNERS:
+                my_parser.error("Unknown alignment method %s in switch" % name)
+        rules.append((method, measure, int(float(threshold)), replacement))
+    return rules
+
 def _parse_arguments(my_parser, my_args):
-    global OUT_LOCATION, ANNOTATIONS, ANNOTATION_DICT, ORDER_ANNOTATION_NAME
+    global OUT_LOCATION, ANNOTATIONS, ANNOTATION_DICT, ORDER_ANNOTATION_NAME, CACHE, MANIFEST_FILE, TEMP_LOCATION, \
+        SWITCH_RULES, PREFIX_RESIDUES, TIME_BUDGET, WRITE_BINARY
+    if my_args.requeue is not None and my_args.requeue <= 2 * HEARTBEAT_INTERVAL:
+        my_parser.error("--requeue must be more than %i seconds, running jobs are only marked as such every %i "
+                        "seconds" % (2 * HEARTBEAT_INTERVAL, HEARTBEAT_INTERVAL))
+    if my_args.worker:
+        _run_worker(my_args)
+        return
+    if not my_args.input or not my_args.alignment_methods:
+        my_parser.error("arguments -i/--input and -alnm/--alignment_methods are required")
+    if my_args.queue and (my_args.incremental or my_args.schedule == "adaptive"):
+        my_parser.error("--queue runs independent jobs, it can not be combined with --incremental or an adaptive "
+                        "schedule")
     OUT_LOCATION = my_args.output
+    if os.path.dirname(OUT_LOCATION) and not os.path.isdir(os.path.dirname(OUT_LOCATION)):
+        os.makedirs(os.path.dirname(OUT_LOCATION))
+    methods = _parse_methods(my_parser, my_args.alignment_methods)
+    SWITCH_RULES = _parse_switch_rules(my_parser, my_args.switch)
+    TIME_BUDGET = my_args.time_budget
+    WRITE_BINARY = my_args.binary
+    MANIFEST_FILE = OUT_LOCATION + "manifest.txt"
+    _start_records(my_args.resume, my_args.log_file if my_args.log_file is not None else OUT_LOCATION + "job_log.txt")
+    if my_args.resume:
+        # Temporary files left behind by jobs of a run of an earlier version, which wrote them next to the outputs
+        for temp_file in _out_paths("temp_"):
+            if OLD_TEMP_FILE.match(os.path.basename(temp_file)[len(os.path.basename(OUT_LOCATION)):]):
+                os.remove(temp_file)
+    if my_args.cache:
+        CACHE = AlignmentCache(my_args.cache, my_args.cache_size * 1048576, my_args.cache_link)
 
     # Load sequences from fasta file
-    input_seqs = read_fasta_file(my_args.input, Protein_Alphabet)
-
     # If an order file was provided, we order the input sequences
     if my_args.order_file:
         ANNOTATIONS = Annotation(my_args.order_file[0])
@@ -77,75 +859,86 @@ def _parse_arguments(my_parser, my_args):
         if _isfloat(_annotation_column[0]):
             _annotation_column = map(float, _annotation_column)
         ANNOTATION_DICT = dict(zip(_name_column, _annotation_column))
-        input_seqs = sorted(input_seqs, key=lambda x: ANNOTATION_DICT[x.name])
+    input_seqs = _read_input(my_args.input, my_args.max_seqs, ANNOTATION_DICT.__getitem__ if my_args.order_file
+                             else None)
 
-    cnt = my_args.seqnumber
-    if my_args.alignment_methods == "all":
-        map(_make_dir, ["linsi", "muscle", "t_coffee"])
-    else:
-        _make_dir(my_args.alignment_methods)
-    while cnt < len(input_seqs):
-        # ALIGN THE INPUT WITH METHOD
-        cur_seqs = input_seqs[:cnt]
-        # Write temporary fasta file for infile
-        temp_in_file = OUT_LOCATION + "temp_cur_seqs.txt"
-        write_fasta_file(temp_in_file, cur_seqs)
-        print "Aligning first %i sequences" % len(cur_seqs)
-        if my_args.alignment_methods == "linsi":
-            # Call aligner
-            print "linsi\t%i" % cnt
-            command_args = ALN_ALG_PATH_ARGS["linsi"] + ["%s" % temp_in_file, ">", "%slinsi_%i.txt" % (OUT_LOCATION +
-                                                                                                        "linsi/", cnt)]
-            subprocess.call(" ".join(command_args),
-                            shell=True)
-        if my_args.alignment_methods == "muscle":
-            # Call aligner
-            print "muscle\t%i" % cnt
-            command_args = ALN_ALG_PATH_ARGS["muscle"] + ["-in", "%s" % temp_in_file, "-out", "%smuscle_%i.txt" %
-                                                           (OUT_LOCATION + "muscle/", cnt)]
-            subprocess.call(" ".join(command_args),
-                            shell=True)
-        if my_args.alignment_methods == "t_coffee":
-            print "t_coffee\t%i" % cnt
-            # Call aligner
-            command_args = ALN_ALG_PATH_ARGS["t_coffee"] + ["-infile=%s" % temp_in_file, "-output=aln",
-                                                             "-outfile=%st_coffee_%i.txt" % (OUT_LOCATION +
-                                                                                             "t_coffee/", cnt)]
-            subprocess.call(" ".join(command_args),
-                            shell=True)
-        if my_args.alignment_methods == "all":
-            # Call aligner
-            command_args1 = ALN_ALG_PATH_ARGS["linsi"] + ["%s" % temp_in_file, ">", "%slinsi_%i.txt" % (OUT_LOCATION +
-                                                                                                        "linsi/", cnt)]
-            command_args2 = ALN_ALG_PATH_ARGS["muscle"] + ["-in", "%s" % temp_in_file, "-out", "%smuscle_%i.txt" %
-                                                           (OUT_LOCATION + "muscle/", cnt)]
-            command_args3 = ALN_ALG_PATH_ARGS["t_coffee"] + ["-infile=%s" % temp_in_file, "-output=aln",
-                                                             "-outfile=%st_coffee_%i.txt" % (OUT_LOCATION +
-                                                                                             "t_coffee/", cnt)]
-            print "linsi\t%i" % cnt
-            subprocess.call(" ".join(command_args1),
-                            shell=True)
-            print "muscle\t%i" % cnt
-            subprocess.call(" ".join(command_args2),
-                            shell=True)
-            print "t_coffee\t%i" % cnt
-            subprocess.call(" ".join(command_args3),
-                            shell=True)
-        cnt += my_args.skip
-    os.remove(temp_in_file)
+    map(_make_dir, set(methods + [rule[3] for rule in SWITCH_RULES if rule[3]]))
+    if my_args.jobs > 1:
+        _balance_cores(my_args.jobs, my_args.cores)
+
+    PREFIX_RESIDUES = [0]
+    for seq in input_seqs:
+        PREFIX_RESIDUES.append(PREFIX_RESIDUES[-1] + len(seq))
+
+    cnts = _schedule(my_args.schedule, my_args.seqnumber, len(input_seqs), my_args.skip, my_args.ratio,
+                     my_args.points)
+    cnts_by_method = dict((method, list(cnts)) for method in methods)
+
+    if my_args.queue:
+        jobs = [(method, cnt) for method, cnt, seqs in _independent_jobs(cnts_by_method, input_seqs, methods)
+                if not _is_completed(method, cnt, seqs)]
+        # Absolute, but still a prefix: workers build paths as OUT_LOCATION + name too
+        out_location = os.path.join(os.path.abspath(os.path.dirname(OUT_LOCATION) or "."),
+                                    os.path.basename(OUT_LOCATION))
+        settings = {"output": out_location, "time_budget": TIME_BUDGET,
+                    "cache": os.path.abspath(my_args.cache) if my_args.cache else None,
+                    "cache_size": my_args.cache_size, "cache_link": my_args.cache_link,
+                    "binary": WRITE_BINARY}
+        JobQueue(my_args.queue).create(input_seqs, settings, jobs)
+        print "Queued %i jobs in %s; start workers with: %s --worker %s" % (len(jobs), my_args.queue, sys.argv[0],
+                                                                           my_args.queue)
+        return
+
+    TEMP_LOCATION = _make_temp_location(my_args.temp_dir)
+    try:
+        _run_jobs(cnts_by_method, input_seqs, methods, my_args)
+        if my_args.schedule == "adaptive":
+            for refinement in range(my_args.max_rounds):
+                new_cnts_by_method = dict((method, _refine(method, cnts_by_method[method], my_args.skip,
+                                                           my_args.refine_on, my_args.tolerance))
+                                          for method in methods)
+                if not any(new_cnts_by_method.values()):
+                    break
+                print "Refinement round %i: %i new steps" % (refinement + 1,
+                                                            sum(map(len, new_cnts_by_method.values())))
+                _run_jobs(new_cnts_by_method, input_seqs, methods, my_args)
+                for method in methods:
+                    cnts_by_method[method] = sorted(cnts_by_method[method] + new_cnts_by_method[method])
+    finally:
+        shutil.rmtree(TEMP_LOCATION, ignore_errors=True)
+
+    if CACHE:
+        print CACHE.report()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Performs gradual alignment of sequences, saving alignments at each '
                                                  'sequence adding step')
-    parser.add_argument('-i', '--input', help='Input FASTA file', required=True)
+    parser.add_argument('-i', '--input', help='Input FASTA file (required unless --worker)', required=False)
     parser.add_argument('-o', '--output', help='Output Location', required=False, default="./")
 
-    parser.add_argument('-alnm', '--alignment_methods', help='Alignment algorithms to use', required=True,
-                        choices=("linsi", "muscle", "t_coffee", "all"))
+    parser.add_argument('-alnm', '--alignment_methods', required=False,
+                        help='Comma separated alignment algorithms to use (required unless --worker), from %s, '
+                             'or "all" for %s' %
+                             (", ".join(sorted(ALIGNERS)), ", ".join(DEFAULT_METHODS)))
 
-    parser.add_argument('-skip', '--skip', help='Skip through input sequences, aligning every Nth set',
+    parser.add_argument('-skip', '--skip', help='Skip through input sequences, aligning every Nth set (with other '
+                                                'schedules, the smallest gap between steps)',
                         required=False, type=int, default="1")
+    parser.add_argument('--schedule', choices=("linear", "geometric", "log", "adaptive"), default="linear",
+                        help='How prefix sizes are chosen: every skip-th (linear), growing by --ratio (geometric), '
+                             '--points log-spaced sizes (log), or geometric refined where the alignments of '
+                             'neighbouring steps differ by more than --tolerance (adaptive)')
+    parser.add_argument('--ratio', type=float, default=1.25, help='Growth of prefix size per step for geometric '
+                                                                   'and adaptive schedules')
+    parser.add_argument('--points', type=int, default=50, help='Number of prefix sizes for the log schedule')
+    parser.add_argument('--refine_on', choices=("length", "entropy", "length,entropy"), default="length",
+                        help='Alignment measure(s) compared between neighbouring steps by the adaptive schedule; '
+                             'entropy is the mean column entropy')
+    parser.add_argument('--tolerance', type=float, default=0.02,
+                        help='Relative change in a measure between neighbouring steps above which the adaptive '
+                             'schedule adds a step between them')
+    parser.add_argument('--max_rounds', type=int, default=10, help='Maximum rounds of adaptive refinement')
 
     parser.add_argument('--order_file', nargs=2, help='if an order file is provided, sequences will be ordered '
                                                         'first; Format should be a tab delimited text file where at '
@@ -156,6 +949,52 @@ if __name__ == "__main__":
                                                       'args = --order_file order_file_name Length',
                                                         required=False)
     parser.add_argument('-sn', '--seqnumber', help='Number of sequences to start alignment from, must be >= 2', type=int, default=2)
+    parser.add_argument('--max_seqs', type=int, required=False,
+                        help='Only use the first N input sequences (after ordering); they are read through an index '
+                             'of the input (written next to it as .fai), so large FASTA files are not loaded')
+    parser.add_argument('-j', '--jobs', help='Number of alignment jobs to run concurrently; larger prefixes are '
+                                             'aligned first (smallest first with --time_budget)', type=int, default=1)
+    parser.add_argument('--cores', help='Number of cores available to the run, shared between concurrent jobs and '
+                                        'aligner threads, e.g., t_coffee -n_core (only used when --jobs > 1)',
+                        type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--incremental', action='store_true',
+                        help='Build each step by adding the new sequences to the alignment of the previous step, '
+                             'instead of realigning from scratch (linsi and muscle only, t_coffee realigns)')
+    parser.add_argument('--add_fragments', action='store_true',
+                        help='With --incremental, add new sequences to linsi alignments as fragments '
+                             '(MAFFT --addfragments)')
+    parser.add_argument('--cache', help='Directory of previously computed alignments; alignments of the same '
+                                        'sequences, method and arguments are reused instead of recomputed',
+                        required=False)
+    parser.add_argument('--cache_size', help='Maximum size of the cache in MB, least recently used alignments are '
+                                             'evicted beyond it', type=float, default=1024)
+    parser.add_argument('--cache_link', action='store_true',
+                        help='Hard link cached alignments into the output location instead of copying them')
+    parser.add_argument('--binary', action='store_true',
+                        help='Also save each alignment in a binary format (METHOD_N.bin), which analysis scripts can '
+                             'memory map instead of parsing the CLUSTAL file')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted run in the same output location, skipping steps recorded as '
+                             'complete in its manifest.txt; incomplete outputs are realigned')
+    parser.add_argument('--temp_dir', help='Location for temporary job files, defaults to /dev/shm where available',
+                        required=False)
+    parser.add_argument('--log_file', help='Record wall time, CPU time, peak memory and exit status of every aligner '
+                                           'call to this file; tab-delimited, or JSON lines if the name ends in '
+                                           '.json (default OUTPUT/job_log.txt, "" to disable)', required=False)
+    parser.add_argument('--switch', nargs=4, action='append', metavar=('METHOD', 'MEASURE', 'THRESHOLD', 'NEW_METHOD'),
+                        help='Replace METHOD by NEW_METHOD (or "none" to drop it) for steps with at least THRESHOLD '
+                             'sequences (MEASURE seqs) or residues (MEASURE residues), e.g., '
+                             '--switch linsi seqs 500 fftns --switch t_coffee residues 100000 none. May be repeated')
+    parser.add_argument('--time_budget', type=float, required=False,
+                        help='Seconds a single job may take; a job going over is killed and its method is not run '
+                             'on larger steps for the rest of the run')
+    parser.add_argument('--queue', help='Instead of aligning, write the jobs to this shared directory for '
+                                        '--worker processes, possibly on other machines, to run', required=False)
+    parser.add_argument('--worker', help='Run jobs from the queue in this directory until none are left; '
+                                         'only --jobs, --cores, --temp_dir and --requeue apply', required=False)
+    parser.add_argument('--requeue', type=float, required=False,
+                        help='With --worker, first return jobs whose workers have not reported them as running for '
+                             'more than this many seconds (e.g., killed workers) to the queue')
     args = parser.parse_args()
 
     # input_file = "./analysis_scripts/epoxide_fasta.txt"
@@ -165,6 +1004,7 @@ if __name__ == "__main__":
     # args = parser.parse_args(["-i", input_file, "-alnm", "t_coffee", "-o", "/Users/julianzaugg/Desktop/my_test/", "--order_file", annotation_data, "EValue", "-sn", "127", "-skip", "1"])
     # args = parser.parse_args(["-i", input_file, "-alnm", "all", "-o", "/Users/julianzaugg/Desktop/my_test/", "--order_file", annotation_data, "EValue", "-sn", "86", "-skip", "20"])
 
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
     _parse_arguments(parser, args)
 
 
@@ -0,0 +1,135 @@
+"""
+Module provides a job queue kept in a shared directory, so that the steps of one gradual alignment can be spread
+over worker processes on several machines without any service besides a shared file system.
+
+The queue directory holds the ordered input sequences (input.fasta), the run settings (settings.json) and one file
+per job in pending/. A worker claims a job by renaming its file into claimed/, which only one worker can succeed at,
+and moves it to done/ or failed/ when finished. Jobs are claimed largest prefix first. While a job runs, its worker
+touches the claimed file every HEARTBEAT_INTERVAL seconds, so only jobs of workers that died look stale.
+"""
+__author__ = 'julianzaugg'
+
+import json
+import os
+import time
+
+from sequence import *
+
+STATES = ("pending", "claimed", "done", "failed")
+# Seconds between touches of a running job's claimed file, see heartbeat; stale jobs are those not touched for longer
+HEARTBEAT_INTERVAL = 30
+
+
+class JobQueue(object):
+
+    def __init__(self, location):
+        """
+        :param location: Queue directory, shared between all workers
+        """
+        self.location = location
+        self.input_file = os.path.join(location, "input.fasta")
+        self.settings_file = os.path.join(location, "settings.json")
+
+    def _dir(self, state):
+        return os.path.join(self.location, state)
+
+    def _job_name(self, method, cnt):
+        # Zero padded, so sorting names sorts jobs by prefix size
+        return "%09i_%s.job" % (cnt, method)
+
+    def create(self, seqs, settings, jobs):
+        """
+        Set up the queue, replacing any pending jobs
+        :param seqs: Ordered input sequences; job cnt aligns the first cnt of them
+        :param settings: Dictionary of run settings for the workers, e.g., the output location
+        :param jobs: List of (method, cnt) pairs
+        """
+        for state in STATES:
+            if not os.path.exists(self._dir(state)):
+                os.makedirs(self._dir(state))
+        for name in os.listdir(self._dir("pending")):
+            os.remove(os.path.join(self._dir("pending"), name))
+        write_fasta_file(self.input_file, seqs)
+        with open(self.settings_file, 'w') as fh:
+            json.dump(settings, fh, indent=1, sort_keys=True)
+        for method, cnt in jobs:
+            name = self._job_name(method, cnt)
+            # Written outside pending/ then moved in, so workers never read a partial job file
+            temp_file = os.path.join(self.location, name + ".tmp")
+            with open(temp_file, 'w') as fh:
+                json.dump({"method": method, "cnt": cnt}, fh)
+            os.rename(temp_file, os.path.join(self._dir("pending"), name))
+
+    def settings(self):
+        with open(self.settings_file, 'r') as fh:
+            return json.load(fh)
+
+    def claim(self, worker_id):
+        """
+        Claim the pending job with the largest prefix
+        :param worker_id: Identifies the claiming worker, e.g., host and process id
+        :return: Dictionary with the job's method and cnt (and its claimed file, for finish), None if no job is left
+        """
+        for name in sorted(os.listdir(self._dir("pending")), reverse=True):
+            if not name.endswith(".job"):
+                continue
+            claimed_file = os.path.join(self._dir("claimed"), "%s.%s" % (name, worker_id))
+            try:
+                # Atomic, so exactly one worker succeeds in claiming the job
+                os.rename(os.path.join(self._dir("pending"), name), claimed_file)
+            except OSError: # claimed by another worker
+                continue
+            # The time of claiming, see requeue_stale
+            os.utime(claimed_file, None)
+            with open(claimed_file, 'r') as fh:
+                job = json.load(fh)
+            job["file"] = claimed_file
+            job["name"] = name
+            return job
+        return None
+
+    def heartbeat(self, job):
+        """
+        Mark a claimed job as still running, see requeue_stale
+        :return: False if the job is no longer claimed, e.g., it was requeued
+        """
+        try:
+            os.utime(job["file"], None)
+            return True
+        except OSError:
+            return False
+
+    def finish(self, job, complete):
+        """
+        Move a claimed job to done/ or, if it did not produce a complete alignment, failed/
+        :return: False if the job was no longer claimed (requeued meanwhile), True otherwise
+        """
+        state = "done" if complete else "failed"
+        try:
+            os.rename(job["file"], os.path.join(self._dir(state), job["name"]))
+            return True
+        except OSError:
+            return False
+
+    def requeue_stale(self, max_age):
+        """
+        Return jobs not marked as running for more than max_age seconds to pending/, e.g., those of workers that
+        were killed; max_age should be well above HEARTBEAT_INTERVAL
+        :return: Number of jobs returned
+        """
+        requeued = 0
+        now = time.time()
+        for name in os.listdir(self._dir("claimed")):
+            claimed_file = os.path.join(self._dir("claimed"), name)
+            try:
+                if now - os.path.getmtime(claimed_file) > max_age:
+                    os.rename(claimed_file, os.path.join(self._dir("pending"), name[:name.index(".job") + 4]))
+                    requeued += 1
+            except OSError: # finished or requeued meanwhile
+                continue
+        return requeued
+
+    def counts(self):
+        """ Return the number of jobs in each state """
+        return dict((state, len([name for name in os.listdir(self._dir(state)) if ".job" in name]))
+                    for state in STATES)
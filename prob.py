@@ -5,6 +5,7 @@ Uses and depends on "Alphabet" that is used to define discrete random variables.
 import random
 from copy import deepcopy
 import math
+import numpy as np
 from alphabet import *
 
 #################################################################################################
@@ -35,6 +36,7 @@ def _getMeTuple(alphas, str):
 
 class Distrib():
     """ A class for a discrete probability distribution, defined over a specified "Alphabet"
+        Counts are kept in a numpy vector, in the order of the alphabet.
         TODO: Fix pseudo counts
               Exclude from counts, specify in constructor,
               include only when computing probabilities by standard formula (n_a + pseudo_a * N^(1/2)) / (N + N^(1/2))
@@ -47,42 +49,40 @@ class Distrib():
         """
         self.pseudo = pseudo or 0.0
         self.alpha = alpha
-        self.cnt = [0.0 for _ in alpha]
-        try: # assume pseudo is a dictionary or a Distrib itself
-            self.tot = 0
-            symndx = 0
-            for sym in alpha:
-                cnt = float(pseudo[sym])
-                self.cnt[symndx] = cnt
-                self.tot = self.tot + cnt
-                symndx += 1
-        except TypeError: # assume pseudo is a single count for each symbol
-            self.cnt = [float(self.pseudo) for _ in alpha]
-            self.tot = float(self.pseudo) * len(alpha) # track total counts (for efficiency)
+        self.reset()
 
     def observe(self, sym, cntme = 1.0):
         """ Make an observation of a symbol
         sym: symbol that is being observed
         cntme: number/weight of observation (default is 1)
         """
-        ndx = self.alpha.symbols.index(sym)
-        self.cnt[ndx] = self.cnt[ndx] + cntme
+        ndx = self.alpha.index(sym)
+        self.cnt[ndx] += cntme
         self.tot = self.tot + cntme
         return
 
+    def observe_many(self, symbols, weights = None):
+        """ Make observations of many symbols at once
+        symbols: string of symbols, or array of symbol codes (see Alphabet.encode)
+        weights: number/weight of each observation (default is 1 for each)
+        """
+        codes = self.alpha.encode(symbols) if isinstance(symbols, basestring) else np.asarray(symbols)
+        invalid = np.flatnonzero(codes >= len(self.alpha))
+        if len(invalid):
+            sym = symbols[invalid[0]] if isinstance(symbols, basestring) else self.alpha.decode(codes[invalid[:1]])
+            raise RuntimeError('Symbol %s is not indexed by alphabet %s' % (sym, str(self.alpha.symbols)))
+        cnts = np.bincount(codes.astype(np.intp), weights, minlength=len(self.alpha))
+        self.cnt += cnts
+        self.tot = self.tot + float(cnts.sum())
+
     def reset(self):
         """ Re-set the counts of this distribution. Pseudo-counts are re-applied. """
-        try:
-            self.tot = 0
-            symndx = 0
-            for sym in self.alpha: # assume it is a Distribution
-                cnt = float(self.pseudo[sym])
-                self.cnt[symndx] = cnt
-                self.tot = self.tot + cnt
-                symndx += 1
+        try: # assume pseudo is a dictionary or a Distrib itself
+            self.cnt = np.array([float(self.pseudo[sym]) for sym in self.alpha])
         except TypeError: # assume pseudo is a single count for each symbol
-            self.cnt = [float(self.pseudo) for _ in self.alpha]
-            self.tot = float(self.pseudo) * len(self.alpha) # track total counts (for efficiency)
+            self.cnt = np.empty(len(self.alpha))
+            self.cnt.fill(float(self.pseudo))
+        self.tot = float(self.cnt.sum()) # track total counts (for efficiency)
 
     def reduce(self, new_alpha):
         """ Create new distribution from self, using (smaller) alphabet new_alpha. """
@@ -95,13 +95,13 @@ class Distrib():
         """ Return the absolute count(s) of the distribution
             or the count for a specified symbol. """
         if sym != None:
-            ndx = self.alpha.symbols.index(sym)
-            return self.cnt[ndx]
+            ndx = self.alpha.index(sym)
+            return float(self.cnt[ndx])
         else:
             d = {}
             index = 0
             for a in self.alpha:
-                d[a] = self.cnt[index]
+                d[a] = float(self.cnt[index])
                 index += 1
             return d
 
@@ -135,7 +135,7 @@ class Distrib():
         if sym != None:
             return self.__getitem__(sym)
         elif self.tot > 0:
-            return [ s / self.tot for s in self.cnt ]
+            return (self.cnt / self.tot).tolist()
         else:
             return [ 1.0 / len(self.alpha) for _ in self.cnt ]
 
@@ -195,13 +195,7 @@ class Distrib():
 
     def getmax(self):
         """ Generate the symbol with the largest probability. """
-        maxprob = 0.0
-        maxsym = None
-        for sym in self.alpha:
-            if self[sym] > maxprob or maxprob == 0.0:
-                maxsym = sym
-                maxprob = self[sym]
-        return maxsym
+        return getmaxes([self])[0]
 
     def divergence(self, distrib2):
         """ Calculate the Kullback-Leibler divergence between two discrete distributions.
@@ -209,26 +203,46 @@ class Distrib():
             When distrib2.prob(x) is 0, it is replaced by 0.0001.
         """
         assert self.alpha == distrib2.alpha
-        sum = 0.0
-        base = len(self.alpha)
-        for sym in self.alpha:
-            if self[sym] > 0:
-                if distrib2[sym] > 0:
-                    sum += math.log(self[sym] / distrib2[sym]) * self[sym]
-                else:
-                    sum += math.log(self[sym] / 0.0001) * self[sym]
-        return sum
+        return float(divergences([self], [distrib2])[0])
 
     def entropy(self):
         """ Calculate the information (Shannon) entropy of the distribution. """
-        sum = 0.0
-        base = len(self.alpha)
-        for sym in self.alpha:
-            p = self.__getitem__(sym)
-            if p == 0:
-                p = 0.0001
-            sum +=  p * math.log(p, base)
-        return -sum
+        return float(entropies([self])[0])
+
+def getProbMatrix(distribs):
+    """ Stack the probabilities of distributions over the same alphabet into a matrix
+    (distributions x symbols, in alphabet order). """
+    cnts = np.array([d.cnt for d in distribs], dtype=float).reshape(len(distribs), -1)
+    tots = np.array([d.tot for d in distribs], dtype=float)
+    probs = np.empty_like(cnts)
+    probs.fill(1.0 / max(1, cnts.shape[1])) # uniform, if there are no counts
+    probs[tots > 0] = cnts[tots > 0] / tots[tots > 0, np.newaxis]
+    return probs
+
+def entropies(distribs):
+    """ Calculate the information (Shannon) entropy of many distributions at once, as Distrib.entropy.
+    distribs: list of Distrib over the same alphabet, or matrix of probabilities (distributions x symbols)
+    Returns an array of entropies. """
+    probs = distribs if isinstance(distribs, np.ndarray) else getProbMatrix(distribs)
+    probs = np.where(probs == 0, 0.0001, probs)
+    return -np.sum(probs * np.log(probs), axis=1) / math.log(probs.shape[1])
+
+def divergences(distribs, distribs2):
+    """ Calculate the Kullback-Leibler divergence of many pairs of distributions at once, as Distrib.divergence.
+    distribs, distribs2: lists of Distrib over the same alphabet, or matrices of probabilities (distributions x symbols)
+    Returns an array of divergences. """
+    p = distribs if isinstance(distribs, np.ndarray) else getProbMatrix(distribs)
+    q = distribs2 if isinstance(distribs2, np.ndarray) else getProbMatrix(distribs2)
+    q = np.where(q > 0, q, 0.0001)
+    ratio = np.where(p > 0, p / q, 1.0)
+    return np.sum(np.log(ratio) * p, axis=1)
+
+def getmaxes(distribs):
+    """ Return the symbol with the largest probability of each distribution (the first in the alphabet on ties),
+    as Distrib.getmax.
+    distribs: list of Distrib over the same alphabet """
+    alpha = distribs[0].alpha
+    return [alpha[ndx] for ndx in np.argmax(getProbMatrix(distribs), axis=1)]
 
 def writeDistribs(distribs, filename):
     """ Write a list/set of distributions to a single file. """
@@ -388,9 +402,11 @@ class Joint(object):
         Variables can be for any defined alphabet. The size of each alphabet determine the
         number of entries in the table (with probs that add up to 1.0) """
 
-    def __init__(self, alphas):
+    def __init__(self, alphas, sparse = True):
         """ A distribution of n-tuples.
         alphas: Alphabet(s) over which the distribution is defined
+        sparse: if False, counts are kept in an array (see TupleStore), so observations are indexed increments
+        and counts with wildcards are sums over array axes; best for small numbers (2-3) of variables
         """
         if type(alphas) is Alphabet:
             self.alphas = tuple( [alphas] )
@@ -398,7 +414,8 @@ class Joint(object):
             self.alphas = alphas
         else:
             self.alphas = tuple( alphas )
-        self.store = TupleStore(self.alphas)
+        self.sparse = sparse
+        self.store = TupleStore(self.alphas, sparse=sparse)
         self.totalCnt = 0
 
     def getN(self):
@@ -410,8 +427,11 @@ class Joint(object):
 
     def reset(self):
         """ Re-set the counts of this joint distribution. Pseudo-counts are re-applied. """
-        for entry in self.store:
-            self.store[entry] = None
+        if not self.sparse:
+            self.store.array.fill(0.0)
+        else:
+            for entry in self.store:
+                self.store[entry] = None
         self.totalCnt = 0
 
     def observe(self, key, cnt = 1):
@@ -420,7 +440,12 @@ class Joint(object):
         cnt: number/weight of observation (default is 1)
         """
         key = _getMeTuple(self.alphas, key)
-        if not None in key:
+        if not self.sparse:
+            ndx = self.store._index(key)
+            # a wildcard spreads the observation over all symbols of its position
+            self.store.array[ndx] += float(cnt) / self.store.array[ndx].size if None in key else cnt
+            self.totalCnt += cnt
+        elif not None in key:
             score = self.store[key]
             if (score == None):
                 score = 0
@@ -437,9 +462,19 @@ class Joint(object):
                 self.store[mykey] = score + mycnt
         return
 
+    def observeCounts(self, counts):
+        """ Add a table of counts, e.g., as collected from an alignment (dense encoding only)
+        counts: array with one dimension per variable, indexed by symbol (in alphabet order)
+        """
+        assert not self.sparse, "Tables of counts can only be added with the dense encoding"
+        self.store.array += counts
+        self.totalCnt += counts.sum()
+
     def count(self, key):
         """ Return the absolute count that is used for the joint probability table. """
         key = _getMeTuple(self.alphas, key)
+        if not self.sparse:
+            return self.store.sum(key)
         score = self.store[key]
         if (score == None):
             score = 0.0
@@ -454,6 +489,10 @@ class Joint(object):
         which can involve "wildcards"
         Note that no assumptions are made regarding independence. """
         key = _getMeTuple(self.alphas, key)
+        if not self.sparse:
+            if self.totalCnt == 0:
+                return 0.0
+            return self.store.sum(key) / float(self.totalCnt)
         score = self.store[key]
         if (score == None):
             score = 0.0
@@ -540,6 +579,18 @@ class IndepJoint(Joint):
                     score = 0
                 self.store[i].observe(subkey, cnt)
 
+    def observeCounts(self, counts):
+        """ Add counts for all positions at once, e.g., as collected from an alignment
+        counts: matrix (positions x symbols, in the order of each position's alphabet), e.g., a numpy array
+        """
+        assert len(counts) == len(self.store), "Number of rows must agree with the number of positions"
+        if hasattr(counts, 'tolist'):
+            counts = counts.tolist()
+        for distrib, row in zip(self.store, counts):
+            assert len(row) == len(distrib.cnt), "Number of counts must agree with the size of the alphabet"
+            distrib.cnt = distrib.cnt + np.asarray(row, dtype=float)
+            distrib.tot += float(sum(row))
+
     def __getitem__(self, key):
         """ Determine and return the probability of a specified expression of the n-tuple
         which can involve "wildcards"
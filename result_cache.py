@@ -0,0 +1,139 @@
+"""
+Module provides an on-disk, content-addressed store of alignment results.
+
+Results are keyed by a hash of everything that determines an alignment: the aligner, its arguments and the ordered
+sequences being aligned (plus, for incremental steps, the alignment being added to). Repeated gradual runs over the
+same sequences, e.g., with a different skip or start, can then reuse earlier alignments instead of recomputing them.
+"""
+__author__ = 'julianzaugg'
+
+import hashlib
+import os
+import shutil
+import threading
+
+
+class AlignmentCache(object):
+
+    def __init__(self, location, max_size=None, link=False):
+        """
+        :param location: Directory holding cached alignments, created if missing
+        :param max_size: Maximum total size of the cache in bytes; least recently used entries are evicted beyond it
+        :param link: Hard link cached files into place rather than copying them (falls back to copying)
+        """
+        self.location = location
+        self.max_size = max_size
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        if not os.path.exists(location):
+            os.makedirs(location)
+        self.size = sum(os.path.getsize(path) for path in self._entries())
+
+    def _entries(self):
+        for dir_path, _, file_names in os.walk(self.location):
+            for file_name in file_names:
+                if not file_name.startswith("."):
+                    yield os.path.join(dir_path, file_name)
+
+    def _path(self, key):
+        # Fan out over sub-directories to keep directory listings short
+        return os.path.join(self.location, key[:2], key + ".txt")
+
+    def key(self, method, args, seqs, base_file=None):
+        """
+        Return the cache key for aligning seqs with method
+        :param method: Name of the alignment method, or mode, e.g., "linsi:add"
+        :param args: Aligner arguments that determine the result
+        :param seqs: Ordered list of Sequence objects being aligned
+        :param base_file: Alignment file the sequences are being added to, if any
+        :return: Hexadecimal digest
+        """
+        digest = hashlib.sha1()
+        digest.update("%s\0%s\0" % (method, "\0".join(args)))
+        for seq in seqs:
+            digest.update("%s\n%s\n" % (seq.name, seq.sequence))
+        if base_file:
+            with open(base_file, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), ''):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def fetch(self, key, out_file):
+        """
+        Place the cached alignment for key at out_file. Any existing out_file is removed first, so that writing to a
+        file that was linked into place earlier can never change the cache.
+        :return: True if the key was in the cache, False otherwise
+        """
+        path = self._path(key)
+        with self._lock:
+            if not os.path.exists(path):
+                self.misses += 1
+                return False
+            self.hits += 1
+            # Mark as recently used for eviction
+            os.utime(path, None)
+        if os.path.exists(out_file):
+            os.remove(out_file)
+        if self.link:
+            try:
+                os.link(path, out_file)
+                return True
+            except OSError:
+                pass
+        shutil.copyfile(path, out_file)
+        return True
+
+    def reject(self, key):
+        """
+        Remove the entry of key, just fetched, that turned out not to hold a complete alignment; the lookup counts
+        as a miss
+        """
+        path = self._path(key)
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+            if os.path.exists(path):
+                self.size -= os.path.getsize(path)
+                os.remove(path)
+                self.evicted += 1
+
+    def store(self, key, out_file):
+        """
+        Add the alignment in out_file to the cache under key
+        """
+        path = self._path(key)
+        if not os.path.exists(os.path.dirname(path)):
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError: # created by a concurrent job
+                pass
+        # Copy then rename, so a concurrent fetch never sees a partial entry
+        temp_path = "%s.%i.%s.tmp" % (path, os.getpid(), threading.current_thread().ident)
+        shutil.copyfile(out_file, temp_path)
+        with self._lock:
+            if os.path.exists(path):
+                self.size -= os.path.getsize(path)
+            os.rename(temp_path, path)
+            self.size += os.path.getsize(path)
+            if self.max_size is not None and self.size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        """ Remove least recently used entries until the cache fits within max_size. """
+        entries = sorted((os.path.getmtime(path), path) for path in self._entries() if not path.endswith(".tmp"))
+        for _, path in entries:
+            if self.size <= self.max_size:
+                break
+            self.size -= os.path.getsize(path)
+            os.remove(path)
+            self.evicted += 1
+
+    def report(self):
+        """ Return a summary of cache use """
+        lookups = self.hits + self.misses
+        rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return "Cache %s: %i hits, %i misses (%.1f%% hit rate), %i evicted, %.1f MB stored" % \
+               (self.location, self.hits, self.misses, rate, self.evicted, self.size / 1048576.0)
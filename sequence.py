@@ -8,6 +8,8 @@ Module contains methods and classes for creating, analysing and manipulating seq
 from collections import Counter
 import numpy as np
 import math
+import os
+import struct
 
 from prob import *
 
@@ -56,15 +58,142 @@ class Sequence(object):
         return fasta
 
 class Alignment(object):
+    """
+    Aligned sequences. Column operations run on a 2-D uint8 matrix of the symbols' ASCII codes (one row per
+    sequence), built once when first needed. Alignments can also be created directly from such a matrix (see
+    from_matrix), in which case Sequence objects are only created if asked for.
+    """
 
     def __init__(self, sequences):
-        self.seqs = [s for s in sequences]
-        self.seqs_dict = dict([(s.name, s) for s in self.seqs])
+        self._seqs = [s for s in sequences]
+        self._seqs_dict = None
+        self._matrix = None
+        self._names = None
+        self._counts = None
         self.alignlen = len(sequences[0])
-        self.alphabet = self.seqs[0].alphabet
+        self.alphabet = self._seqs[0].alphabet
+
+    @classmethod
+    def from_matrix(cls, matrix, names, alphabet = None):
+        """
+        Create an alignment from a symbol code matrix, without creating Sequence objects
+        :param matrix: 2-D uint8 array, one row of ASCII codes per sequence
+        :param names: Names of the sequences, in row order
+        :param alphabet: Alphabet of the sequences
+        """
+        if matrix.ndim != 2 or matrix.shape[0] != len(names):
+            raise ValueError("Alignment matrix must have one row per sequence name")
+        aln = cls.__new__(cls)
+        aln._seqs = None
+        aln._seqs_dict = None
+        aln._matrix = matrix.view(np.uint8)
+        aln._names = list(names)
+        aln._counts = None
+        aln.alignlen = matrix.shape[1]
+        aln.alphabet = alphabet
+        return aln
+
+    @property
+    def seqs(self):
+        if self._seqs is None:
+            self._seqs = [Sequence(self.matrix[i].tostring(), alphabet=self.alphabet, name=name)
+                          for i, name in enumerate(self._names)]
+        return self._seqs
+
+    @property
+    def seqs_dict(self):
+        if self._seqs_dict is None:
+            self._seqs_dict = dict([(s.name, s) for s in self.seqs])
+        return self._seqs_dict
+
+    @property
+    def names(self):
+        if self._names is None:
+            self._names = [s.name for s in self._seqs]
+        return self._names
+
+    @property
+    def matrix(self):
+        """ Symbol code matrix (sequences x columns), read-only as rows and columns are shared as views """
+        if self._matrix is None:
+            if any(len(s) != self.alignlen for s in self._seqs):
+                raise ValueError("Sequences of an alignment must all be of the same length")
+            self._matrix = np.frombuffer("".join([s.sequence for s in self._seqs]),
+                                         dtype=np.uint8).reshape(len(self._seqs), self.alignlen)
+        return self._matrix
+
+    def get_column_codes(self, position):
+        """ Return the symbol codes of a column, as a view of the matrix """
+        return self.matrix[:, position]
+
+    def get_row_codes(self, ndx):
+        """ Return the symbol codes of a sequence, as a view of the matrix """
+        return self.matrix[ndx]
+
+    def _alphabet_codes(self):
+        return self.alphabet.ascii_codes
+
+    def _column_counts(self, position):
+        return np.bincount(self.get_column_codes(position), minlength=256)
+
+    def _symbol_counts(self):
+        """
+        Count every symbol code in every column in one pass, by offsetting the codes of column i by 256 * i
+        :return: Array of counts (columns x 256), indexed by ASCII code
+        """
+        if self._counts is None:
+            offsets = np.arange(self.alignlen, dtype=np.int32) * 256
+            self._counts = np.bincount((self.matrix + offsets).ravel(),
+                                       minlength=256 * self.alignlen).reshape(self.alignlen, 256)
+        return self._counts
+
+    def get_column_counts(self):
+        """
+        Return the counts of each alphabet symbol in all columns
+        :return: Array (columns x alphabet symbols, in alphabet order)
+        """
+        return self._symbol_counts()[:, self._alphabet_codes()]
+
+    def get_column_frequencies(self):
+        """
+        Return the frequencies of each alphabet symbol in all columns, as fractions of the number of sequences
+        (gaps and other symbols make up the remainder)
+        :return: Array (columns x alphabet symbols, in alphabet order)
+        """
+        return self.get_column_counts() / float(len(self))
+
+    def get_column_entropies(self, base = None):
+        """
+        Return the Shannon entropy of all columns, as get_shannon_entropy
+        :param base: Base of the logarithm, None for natural logarithm
+        :return: Array of entropies, one per column
+        """
+        probs = self.get_column_frequencies()
+        logs = np.log(np.where(probs > 0.0, probs, 1.0))
+        entropies = -np.sum(probs * logs, axis=1)
+        if base:
+            entropies /= math.log(base)
+        return entropies + 0.0 # no negative zeros
+
+    def get_gap_fractions(self):
+        """ Return the fraction of gaps in all columns, as get_percent_gaps """
+        return self._symbol_counts()[:, ord("-")] / float(len(self))
+
+    def get_consensus(self):
+        """
+        Return the most common alphabet symbol of each column (the first in alphabet order on ties, a gap if the
+        column holds no alphabet symbols)
+        :return: String of consensus symbols, one per column
+        """
+        counts = self.get_column_counts()
+        consensus = self._alphabet_codes()[np.argmax(counts, axis=1)]
+        consensus[counts.max(axis=1) == 0] = ord("-")
+        return consensus.tostring()
 
     def __len__(self):
-        return len(self.seqs)
+        if self._seqs is None:
+            return len(self._names)
+        return len(self._seqs)
 
     def __getitem__(self, ndx):
         return self.seqs[ndx]
@@ -80,7 +209,10 @@ class Alignment(object):
 
     def add_sequence(self, sequence):
         self.seqs.append(sequence)
-        self.seqs_dict = dict([(s.name, s) for s in self.seqs])
+        self._seqs_dict = None
+        self._names = None
+        self._matrix = None
+        self._counts = None
 
     def get_sequence(self, seq_name):
         try:
@@ -92,8 +224,8 @@ class Alignment(object):
         """
         Returns probabilities of each symbol in the alphabet at a position
         """
-        colstr = "".join([seq[position] for seq in self.seqs])
-        cnts = Counter(colstr)
+        col_counts = self._column_counts(position)
+        cnts = Counter(dict((chr(code), int(col_counts[code])) for code in np.flatnonzero(col_counts)))
         for sym in self.alphabet:
             if sym not in cnts and pseudo:
                 cnts[sym] = pseudo
@@ -138,119 +270,368 @@ class Alignment(object):
             return
         return string
 
+    def write_binary_file(self, filename):
+        """
+        Save the Alignment in the binary alignment format, see read_binary_file
+        """
+        names = "\n".join(self.names)
+        # The matrix starts on a 64 byte boundary
+        matrix_offset = (BINARY_HEADER.size + len(names) + 63) // 64 * 64
+        with open(filename, 'wb') as fh:
+            fh.write(BINARY_HEADER.pack(BINARY_MAGIC, len(self), self.alignlen, len(names), matrix_offset))
+            fh.write(names)
+            fh.write("\0" * (matrix_offset - BINARY_HEADER.size - len(names)))
+            fh.write(np.ascontiguousarray(self.matrix).tostring())
+
     def get_profile(self, pseudo = 0.0):
         """ Determine the probability matrix from the alignment, assuming
-        that each position is independent of all others. """
-        p = IndepJoint([self.alphabet for _ in range(self.alignlen)], pseudo)
-        for seq in self.seqs:
-            p.observe(seq)
+        that each position is independent of all others. Gaps and wildcards
+        count as a fraction of each symbol of the alphabet. """
+        alpha = self.alphabet
+        # Map the per-column counts of each character onto the alphabet's codes
+        to_codes = np.zeros((256, alpha.ncodes))
+        to_codes[np.arange(256), alpha.lookup] = 1.0
+        counts = self._symbol_counts().dot(to_codes)
+        unknown = np.flatnonzero(self._symbol_counts()[:, alpha.lookup == alpha.unknown_code].sum(axis=0))
+        if len(unknown):
+            raise RuntimeError('Symbol %s is not indexed by alphabet %s' %
+                               (chr(np.flatnonzero(alpha.lookup == alpha.unknown_code)[unknown[0]]), str(alpha)))
+        spread = (counts[:, alpha.gap_code] + counts[:, alpha.wildcard_code]) / len(alpha)
+        p = IndepJoint([alpha for _ in range(self.alignlen)], pseudo)
+        p.observeCounts(counts[:, :len(alpha)] + spread[:, np.newaxis])
         return p
 
-    def get_ungapped(self):
+    def select_columns(self, columns, view = False):
+        """
+        Return an alignment of the specified columns, in one operation over the symbol matrix
+        :param columns: Boolean mask over the columns, or array of column indices
+        :param view: Return an AlignmentView that refers to this alignment instead of copying its data
+        """
+        columns = np.asarray(columns)
+        if columns.dtype == bool:
+            columns = np.flatnonzero(columns)
+        if view:
+            return AlignmentView(self, columns)
+        return Alignment.from_matrix(self.matrix[:, columns], self.names, self.alphabet)
+
+    def get_joint(self, columns):
+        """ Determine the joint probability table of the specified columns (e.g., a pair) from the
+        symbols of each sequence, using the dense encoding of Joint. Gaps and wildcards count as a
+        fraction of each symbol of the alphabet, as in Joint.observe. """
+        alpha = self.alphabet
+        columns = list(columns)
+        codes = alpha.encode(self.matrix[:, columns])
+        if (codes == alpha.unknown_code).any():
+            row, col = np.argwhere(codes == alpha.unknown_code)[0]
+            raise RuntimeError('Symbol %s is not indexed by alphabet %s' %
+                               (chr(self.matrix[row, columns[col]]), str(alpha)))
+        shape = (len(alpha),) * len(columns)
+        joint = Joint([alpha for _ in columns], sparse=False)
+        # Sequences with a symbol in every column are counted at once, the others observed one at a time
+        full = (codes < len(alpha)).all(axis=1)
+        flat = np.ravel_multi_index(codes[full].T.astype(np.intp), shape)
+        joint.observeCounts(np.bincount(flat, minlength=np.prod(shape)).reshape(shape).astype(float))
+        for row in codes[~full]:
+            joint.observe(tuple(alpha[code] if code < len(alpha) else None for code in row))
+        return joint
+
+    def get_ungapped(self, view = False):
         """
         Return new alignment with gappy columns removed
+        :param view: Return an AlignmentView instead of copying the remaining columns
         """
-        gappy_columns = set()
-        for seq in self:
-            for i in range(self.alignlen):
-                if i not in gappy_columns and seq[i] == "-":
-                    gappy_columns.add(i)
-        new_seqs = []
-        for seq in self:
-            content = "".join([seq[i] for i in range(self.alignlen) if i not in gappy_columns])
-            new_seqs.append(Sequence(sequence=content, alphabet=seq.alphabet, name=seq.name))
-        return Alignment(new_seqs)
-
-    def get_ungapped_using_reference(self, seq_name):
+        return self.select_columns(self._symbol_counts()[:, ord("-")] == 0, view)
+
+    def get_ungapped_using_reference(self, seq_name, view = False):
         """
         Return a new alignment where gappy columns have been removed using in respect to
         a user specified reference sequence
-        :param name: Name of template sequence
+        :param seq_name: Name of template sequence
+        :param view: Return an AlignmentView instead of copying the remaining columns
         :return:
         """
-        template_seq = self.get_sequence(seq_name)
-        #Find gapped column indices
-        gappy_columns = [i for i in xrange(len(template_seq)) if template_seq[i] == "-"]
-        new_seqs = []
-        for seq in self:
-            content = "".join([seq[i] for i in range(self.alignlen) if i not in gappy_columns])
-            new_seqs.append(Sequence(sequence=content, alphabet=seq.alphabet, name=seq.name))
-        return Alignment(new_seqs)
+        try:
+            row = self.names.index(seq_name)
+        except ValueError:
+            raise KeyError("Sequence %s was not found in the alignment" % seq_name)
+        return self.select_columns(self.get_row_codes(row) != ord("-"), view)
 
     def get_column(self, position):
-        return [s[position] for s in self]
+        return list(self.get_column_codes(position).tostring())
 
     def get_shannon_entropy(self, position, base = None):
-        col_values = self.get_column(position)
-        entropy = 0.0
-        counts = Counter(col_values) # missing characters get a count of 0 automatically
-        for k in xrange(len(self.alphabet)):
-            cur_aa = self.alphabet[k]
-            cur_aa_count = float(counts[cur_aa])
-            prob = cur_aa_count / len(col_values)
-            if prob > 0.0:
-                if base:
-                    entropy += (prob * math.log(prob, base))
-                else:
-                    entropy += (prob * math.log(prob))
-        if entropy != 0.0:
-            entropy = -entropy
-        return entropy
+        # Gaps and other symbols outside the alphabet count towards the column size only
+        probs = self._column_counts(position)[self._alphabet_codes()] / float(len(self))
+        probs = probs[probs > 0.0]
+        entropy = -float(np.sum(probs * np.log(probs)))
+        if base:
+            entropy /= math.log(base)
+        return entropy if entropy != 0.0 else 0.0
 
     def get_percent_gaps(self, position):
-        col_values = self.get_column(position)
-        counts = Counter(col_values)
-        return float(counts["-"])/len(col_values)
+        return float(self._column_counts(position)[ord("-")])/len(self)
+
+class AlignmentView(Alignment):
+    """
+    Alignment of a subset of the columns of another alignment, see Alignment.select_columns. Keeps only the indices
+    of its columns; column operations are answered from the parent alignment, and a matrix (or Sequence objects)
+    of its own is only created if asked for.
+    """
+
+    def __init__(self, parent, columns):
+        """
+        :param parent: Alignment the columns are taken from
+        :param columns: Array of column indices of parent
+        """
+        self.parent = parent
+        self.columns = columns
+        self._seqs = None
+        self._seqs_dict = None
+        self._matrix = None
+        self._names = parent.names
+        self._counts = None
+        self.alignlen = len(columns)
+        self.alphabet = parent.alphabet
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = self.parent.matrix[:, self.columns]
+            self._matrix.flags.writeable = False
+        return self._matrix
+
+    def get_column_codes(self, position):
+        return self.parent.get_column_codes(self.columns[position])
+
+    def _symbol_counts(self):
+        if self._counts is None:
+            self._counts = self.parent._symbol_counts()[self.columns]
+        return self._counts
+
+    def add_sequence(self, sequence):
+        raise RuntimeError("Sequences can not be added to a view of an alignment")
+
+def iter_fasta_file(filename, alphabet):
+    """
+    Read a Fasta file one record at a time
+    :return: Generator of Sequence objects, in file order
+    """
+    name = None
+    chunks = []
+    with open(filename, 'r') as fh:
+        for line in fh:
+            line = line.strip()
+            if not line: continue
+            if line[0] == '>':
+                if name is not None:
+                    yield Sequence(name=name, sequence="".join(chunks), alphabet=alphabet)
+                name = line.split()[0][1:]
+                chunks = []
+            else:
+                chunks.append(line)
+    if name is not None:
+        yield Sequence(name=name, sequence="".join(chunks), alphabet=alphabet)
 
 def read_fasta_file(filename, alphabet):
     """
-    Read a Fasta file and return a set of Sequence
-    {name: seq_string}
+    Read a Fasta file and return a list of Sequence
+    """
+    return list(iter_fasta_file(filename, alphabet))
+
+class FastaIndex(object):
+    """
+    Random access to the sequences of a Fasta file, by name or ordinal, without reading the file into memory.
+    Uses a samtools-style .fai index (name, length, offset, residues per line, bytes per line), kept next to
+    the Fasta file and rebuilt when older than it or when it does not match the file's first and last sequences.
+    As with samtools, all lines of a sequence but its last must be of the same length.
+    For example, with index = FastaIndex("seqs.fa", Protein_Alphabet), index[:100] is a list of the first 100
+    sequences, and index[0] or index["aspni-hyl1"] a single sequence.
     """
-    fh = open(filename, 'r')
-    seqdata = dict()
-    order = []
-    data = [line.strip() for line in fh.readlines() if line is not None]
-
-    for line in data:
-        if not line: continue
-        if line[0] == '>':
-            name = line.split()[0][1:]
-            order.append(name)
-            seqdata[name] = ''
-        else:
-            seqdata[name] += line
-    output = []
-    for sname in order:
-        sseq = seqdata[sname]
-        output.append(Sequence(name=sname, sequence=sseq.strip(), alphabet=alphabet))
-    return output
-
-def read_clustal_file(filename, alpha):
+
+    def __init__(self, filename, alphabet, index_file = None):
+        """
+        :param filename: Fasta file
+        :param alphabet: Alphabet of the sequences
+        :param index_file: Location of the index, default filename + ".fai"; if it can not be written, the index is
+        only kept in memory
+        """
+        self.filename = filename
+        self.alphabet = alphabet
+        self.index_file = index_file or filename + ".fai"
+        self.entries = None
+        if os.path.exists(self.index_file) and os.path.getmtime(self.index_file) >= os.path.getmtime(filename):
+            self.entries = self._read_index()
+            if not self._matches_file():
+                self.entries = None
+        if self.entries is None:
+            self.entries = self._build_index()
+            try:
+                self._write_index()
+            except IOError:
+                pass
+        self.names = [entry[0] for entry in self.entries]
+        self.lengths = [entry[1] for entry in self.entries]
+        self.ordinals = dict((name, i) for i, name in enumerate(self.names))
+
+    def _build_index(self):
+        entries = []
+        name = None
+        offset = 0
+        with open(self.filename, 'rb') as fh:
+            for line in fh:
+                line_offset = offset
+                offset += len(line)
+                residues = len(line.strip())
+                if line[0] == '>':
+                    if name is not None:
+                        entries.append((name, length, seq_offset, line_bases, line_width))
+                    name = line.split()[0][1:]
+                    length, seq_offset, line_bases, line_width = 0, offset, 0, 0
+                    last_bases = None
+                elif name is not None and residues:
+                    if last_bases is not None and last_bases != line_bases:
+                        raise ValueError("Lines of sequence %s in %s differ in length, which can not be indexed" %
+                                         (name, self.filename))
+                    if not line_bases:
+                        line_bases, line_width = residues, len(line)
+                    elif residues > line_bases or (residues == line_bases and len(line) != line_width):
+                        raise ValueError("Lines of sequence %s in %s differ in length, which can not be indexed" %
+                                         (name, self.filename))
+                    if length == 0:
+                        seq_offset = line_offset
+                    length += residues
+                    last_bases = residues
+                elif name is not None and length:
+                    last_bases = 0 # a blank line can only follow the last line of a sequence
+        if name is not None:
+            entries.append((name, length, seq_offset, line_bases, line_width))
+        return entries
+
+    def _read_index(self):
+        entries = []
+        with open(self.index_file, 'r') as fh:
+            for line in fh:
+                sections = line.rstrip("\n").split("\t")
+                entries.append((sections[0],) + tuple(int(value) for value in sections[1:5]))
+        return entries
+
+    def _matches_file(self):
+        """
+        Check the index against the Fasta file, as a file replaced by another (e.g., copied with its modification
+        time) may look older than the index: the file must start with the first sequence's name and end with the
+        last sequence
+        """
+        if not self.entries:
+            return False
+        first_name = self.entries[0][0]
+        _, length, offset, line_bases, line_width = self.entries[-1]
+        end = offset + (length + (length - 1) / line_bases * (line_width - line_bases) if length else 0)
+        with open(self.filename, 'rb') as fh:
+            head = fh.read(len(first_name) + 2)
+            fh.seek(end)
+            tail = fh.read(line_width + 2)
+        if not head.startswith(">" + first_name) or not (head + "\n")[len(first_name) + 1].isspace():
+            return False
+        return not tail.strip() and os.path.getsize(self.filename) - end < line_width + 2
+
+    def _write_index(self):
+        with open(self.index_file, 'w') as fh:
+            for entry in self.entries:
+                fh.write("%s\t%i\t%i\t%i\t%i\n" % entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.ordinals
+
+    def __getitem__(self, key):
+        """ Return the sequence with the given ordinal or name, or a list of the sequences of a slice of ordinals """
+        if isinstance(key, slice):
+            return self.get_sequences(xrange(*key.indices(len(self))))
+        if isinstance(key, basestring):
+            try:
+                key = self.ordinals[key]
+            except KeyError:
+                raise KeyError("Sequence %s was not found in %s" % (key, self.filename))
+        return self.get_sequences([key])[0]
+
+    def get_sequences(self, ordinals):
+        """ Return a list of the sequences with the given ordinals, in that order """
+        seqs = []
+        with open(self.filename, 'rb') as fh:
+            for ordinal in ordinals:
+                name, length, offset, line_bases, line_width = self.entries[ordinal]
+                fh.seek(offset)
+                if length:
+                    data = fh.read(length + (length - 1) / line_bases * (line_width - line_bases))
+                else:
+                    data = ''
+                seqs.append(Sequence(name=name, sequence=data.replace("\n", "").replace("\r", "").strip(),
+                                     alphabet=self.alphabet))
+        return seqs
+
+def read_clustal_file(filename, alpha, encoded = False):
     """
-    Read a CLUSTAL Alignment file and return a dictionary of sequence data
+    Read a CLUSTAL Alignment file and return an Alignment, with sequences in the order they first appear
+    :param encoded: Build the alignment directly as a symbol matrix (see Alignment.from_matrix), without creating
+    Sequence objects; sequences must then all be of the same length
     """
-    fh = open(filename, 'r')
+    chunks = dict() # sequence name: list of sequence chunks, joined once all blocks are read
     names = []
-    seqdata = dict()
-    data = [line.strip('\n') for line in fh.readlines() if line is not None]
-    for line in data:
-        if line.startswith('CLUSTAL') or line.startswith('#'):
-            continue
-        if len(line) == 0:
-            continue
-        if line[0] == ' ' or '*' in line or ':' in line:
-            continue
-        sections = line.split()
-        name, seqstr = sections[0], "".join(sections[1:])
-        names.append(name)
-        if seqdata.has_key(name):
-            seqdata[name] += seqstr
-        else:
-            seqdata[name] = seqstr
-    sequences = [Sequence(seqstr, name=seqname, alphabet=alpha) for seqname, seqstr in sorted(seqdata.items(),
-                                                                            key=lambda x: names.index(x[0]))]
-    return Alignment(sequences)
+    with open(filename, 'r') as fh:
+        for line in fh:
+            if line.startswith('CLUSTAL') or line.startswith('#'):
+                continue
+            line = line.rstrip('\n')
+            if len(line) == 0:
+                continue
+            if line[0] == ' ' or '*' in line or ':' in line:
+                continue
+            sections = line.split()
+            name = sections[0]
+            try:
+                chunks[name].extend(sections[1:])
+            except KeyError:
+                names.append(name)
+                chunks[name] = sections[1:]
+    if encoded:
+        seqstrs = ["".join(chunks[name]) for name in names]
+        if any(len(seqstr) != len(seqstrs[0]) for seqstr in seqstrs):
+            raise ValueError("Sequences of an alignment must all be of the same length")
+        matrix = np.frombuffer("".join(seqstrs), dtype=np.uint8).reshape(len(names), len(seqstrs[0]))
+        return Alignment.from_matrix(matrix, names, alpha)
+    return Alignment([Sequence("".join(chunks[name]), name=name, alphabet=alpha) for name in names])
+
+# Binary alignment format: header (magic, number of sequences, alignment length, size of the name table and
+# offset of the matrix, little endian), newline separated name table, then the uint8 symbol matrix row by row
+BINARY_MAGIC = "GRADALN1"
+BINARY_HEADER = struct.Struct("<8sQQQQ")
+
+def read_binary_file(filename, alpha):
+    """
+    Open an alignment saved with Alignment.write_binary_file. The symbol matrix is memory mapped rather than
+    read, so opening takes constant time and processes reading the same file share its pages.
+    """
+    with open(filename, 'rb') as fh:
+        header = fh.read(BINARY_HEADER.size)
+        if len(header) < BINARY_HEADER.size or not header.startswith(BINARY_MAGIC):
+            raise ValueError("%s is not a binary alignment file" % filename)
+        _, nseqs, alignlen, names_size, matrix_offset = BINARY_HEADER.unpack(header)
+        names = fh.read(names_size).split("\n")
+    matrix = np.memmap(filename, dtype=np.uint8, mode='r', offset=matrix_offset, shape=(nseqs, alignlen))
+    return Alignment.from_matrix(matrix, names, alpha)
+
+def read_alignment_file(filename, alpha):
+    """
+    Read an alignment saved either in the binary format (see read_binary_file) or in CLUSTAL format, as an
+    encoded alignment (see read_clustal_file)
+    """
+    with open(filename, 'rb') as fh:
+        binary = fh.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+    if binary:
+        return read_binary_file(filename, alpha)
+    return read_clustal_file(filename, alpha, encoded=True)
 
 def write_fasta_file(filename, seqs):
     """ Write the specified sequences to a FASTA file. """